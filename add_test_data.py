@@ -23,6 +23,7 @@ async def add_volume():
             query = text("""
                 INSERT INTO sheet_transactions (
                     client_username,
+                    client_key,
                     transaction_date,
                     payment_id,
                     amount_gross,
@@ -35,6 +36,7 @@ async def add_volume():
                     intermediary_status
                 ) VALUES (
                     '@notodyss',
+                    'notodyss',
                     CURRENT_DATE,
                     :payment_id,
                     1100.00,
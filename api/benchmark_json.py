@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serialization of a /api/transactions page.
+
+    python api/benchmark_json.py [rows] [repeats]
+
+Builds a synthetic page (default 500 rows, as returned by
+TRANSACTIONS_PAGE_QUERIES) and renders it three ways:
+
+- models:  per-row Transaction + TransactionsResponse, then what FastAPI does
+           with a response_model (model_dump, re-validation, JSON-mode dump,
+           json.dumps) - the path used before common/fast_json.py;
+- dicts:   transactions_payload() + stdlib json.dumps;
+- orjson:  transactions_payload() + fast_json.dumps (the current path).
+
+Checks that all outputs decode to the same JSON and prints timings.
+The models path needs pydantic (installed with fastapi) and is skipped without it.
+"""
+import json
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from common import fast_json
+from common.fast_json import dumps, transactions_payload
+
+try:
+    from pydantic import BaseModel
+except ImportError:
+    BaseModel = None
+
+SYSTEMS = ['PayPal', 'Stripe', 'Wise', None]
+STATUSES = ['completed', 'pending']
+
+
+def make_rows(count: int) -> list:
+    rnd = random.Random(42)
+    start = date(2025, 1, 1)
+    rows = []
+    for i in range(count):
+        rows.append((
+            100_000 - i,
+            rnd.choice(SYSTEMS),
+            Decimal(rnd.randint(0, 500_000)) / 100 if rnd.random() > 0.02 else None,
+            start + timedelta(days=rnd.randint(0, 600)) if rnd.random() > 0.05 else None,
+            rnd.choice(STATUSES),
+        ))
+    return rows
+
+
+# --- Previous path: api/main.py response models (same fields) ---
+
+if BaseModel is not None:
+    class Transaction(BaseModel):
+        id: int
+        payment_method: str
+        amount: float
+        created_at: str
+        status: str
+
+    class TransactionsResponse(BaseModel):
+        transactions: List[Transaction]
+        total: Optional[int] = None
+        next_cursor: Optional[str] = None
+
+
+def render_models(rows, total, next_cursor) -> bytes:
+    response = TransactionsResponse(
+        transactions=[
+            Transaction(
+                id=row[0],
+                payment_method=row[1] or "Unknown",
+                amount=float(row[2]) if row[2] else 0.0,
+                created_at=row[3].isoformat() if row[3] else datetime.now().isoformat(),
+                status=row[4]
+            )
+            for row in rows
+        ],
+        total=total,
+        next_cursor=next_cursor
+    )
+    # fastapi.routing.serialize_response with response_model, then JSONResponse.render
+    content = response.model_dump(by_alias=True)
+    validated = TransactionsResponse.model_validate(content)
+    data = validated.model_dump(mode="json")
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def render_dicts(rows, total, next_cursor) -> bytes:
+    payload = transactions_payload(rows, total, next_cursor)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def render_orjson(rows, total, next_cursor) -> bytes:
+    return dumps(transactions_payload(rows, total, next_cursor))
+
+
+def normalized(body: bytes, rows) -> dict:
+    # Rows without a date get datetime.now(): compare everything else
+    data = json.loads(body)
+    for item, row in zip(data["transactions"], rows):
+        if row[3] is None:
+            item["created_at"] = None
+    return data
+
+
+def bench(func, rows, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func(rows, 12345, "eyJjdXJzb3IiOjF9")
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rows = make_rows(count)
+
+    paths = [("dicts", render_dicts), ("orjson", render_orjson)]
+    if BaseModel is not None:
+        paths.insert(0, ("models", render_models))
+    else:
+        print("pydantic not installed: models path skipped")
+    if fast_json.orjson is None:
+        print("orjson not installed: fast_json falls back to stdlib json")
+
+    expected = normalized(render_dicts(rows, 12345, "eyJjdXJzb3IiOjF9"), rows)
+    for name, func in paths:
+        assert normalized(func(rows, 12345, "eyJjdXJzb3IiOjF9"), rows) == expected, f"{name}: output differs"
+
+    print(f"{count} rows, best of {repeats}")
+    baseline = None
+    for name, func in paths:
+        seconds = bench(func, rows, repeats)
+        baseline = baseline or seconds
+        print(f"  {name:7s} {seconds * 1000:8.3f} ms   x{baseline / seconds:.1f}")
+
+
+if __name__ == '__main__':
+    main()
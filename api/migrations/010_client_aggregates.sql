@@ -0,0 +1,64 @@
+-- Materialized per-client aggregates over sheet_transactions.
+-- Maintained by GoogleSheetsSync for the clients touched by each sync batch,
+-- so the API serves statistics and access checks from one indexed row.
+-- client_username is stored lowercased (LOWER(sheet_transactions.client_username)).
+
+-- 1. Lifetime totals (withdrawal_received = TRUE rows only, except all_rows)
+CREATE TABLE IF NOT EXISTS client_aggregates (
+    client_username VARCHAR(255) PRIMARY KEY,
+    total_checks INT NOT NULL DEFAULT 0,
+    total_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,       -- SUM(withdrawal_amount)
+    avg_check DECIMAL(18, 2) NOT NULL DEFAULT 0,       -- AVG(withdrawal_amount)
+    total_gross DECIMAL(18, 2) NOT NULL DEFAULT 0,     -- SUM(amount_gross), premium access
+    dated_checks INT NOT NULL DEFAULT 0,               -- checks with transaction_date
+    dated_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    months_active INT NOT NULL DEFAULT 0,              -- number of monthly buckets
+    all_rows INT NOT NULL DEFAULT 0,                   -- all transactions, any status
+    last_transaction_date DATE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 2. Monthly buckets
+CREATE TABLE IF NOT EXISTS client_aggregates_monthly (
+    client_username VARCHAR(255) NOT NULL,
+    month DATE NOT NULL,
+    checks_count INT NOT NULL DEFAULT 0,
+    withdrawal_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    gross_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (client_username, month)
+);
+
+-- 3. Initial backfill
+INSERT INTO client_aggregates_monthly (client_username, month, checks_count, withdrawal_sum, gross_sum)
+SELECT
+    LOWER(client_username),
+    DATE_TRUNC('month', transaction_date)::date,
+    COUNT(*),
+    COALESCE(SUM(withdrawal_amount), 0),
+    COALESCE(SUM(amount_gross), 0)
+FROM sheet_transactions
+WHERE client_username IS NOT NULL
+  AND withdrawal_received = TRUE
+  AND transaction_date IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT (client_username, month) DO NOTHING;
+
+INSERT INTO client_aggregates (
+    client_username, total_checks, total_sum, avg_check, total_gross,
+    dated_checks, dated_sum, months_active, all_rows, last_transaction_date
+)
+SELECT
+    LOWER(client_username),
+    COUNT(*) FILTER (WHERE withdrawal_received),
+    COALESCE(SUM(withdrawal_amount) FILTER (WHERE withdrawal_received), 0),
+    COALESCE(AVG(withdrawal_amount) FILTER (WHERE withdrawal_received), 0),
+    COALESCE(SUM(amount_gross) FILTER (WHERE withdrawal_received), 0),
+    COUNT(*) FILTER (WHERE withdrawal_received AND transaction_date IS NOT NULL),
+    COALESCE(SUM(withdrawal_amount) FILTER (WHERE withdrawal_received AND transaction_date IS NOT NULL), 0),
+    COUNT(DISTINCT DATE_TRUNC('month', transaction_date)) FILTER (WHERE withdrawal_received),
+    COUNT(*),
+    MAX(transaction_date)
+FROM sheet_transactions
+WHERE client_username IS NOT NULL
+GROUP BY 1
+ON CONFLICT (client_username) DO NOTHING;
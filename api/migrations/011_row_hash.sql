@@ -0,0 +1,7 @@
+-- Row-hash change detection for the transactions sync.
+-- The sync loads {sheet_row_number: row_hash} once per run and only upserts
+-- rows whose hash changed, instead of rewriting the whole table every cycle.
+ALTER TABLE sheet_transactions ADD COLUMN IF NOT EXISTS row_hash VARCHAR(32);
+
+CREATE INDEX IF NOT EXISTS idx_sheet_transactions_row_number
+ON sheet_transactions (sheet_row_number);
@@ -0,0 +1,22 @@
+-- Outbox for Google Sheets ticket export.
+-- create_transaction / confirm_transaction insert a row in the same DB
+-- transaction as the ticket, the worker in the bot process drains pending
+-- rows in batches (one batch_update per flush) with retry/backoff.
+CREATE TABLE IF NOT EXISTS sheets_outbox (
+    id SERIAL PRIMARY KEY,
+    transaction_id INTEGER REFERENCES transactions(id),
+    username VARCHAR(255) NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    amount VARCHAR(50),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    sheet_row INTEGER,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_sheets_outbox_pending
+ON sheets_outbox (next_attempt_at, id)
+WHERE status = 'pending';
@@ -0,0 +1,19 @@
+-- Keyset (cursor) pagination indexes.
+-- Listings are ordered by (date, id) and continue from the last row of the
+-- previous page: WHERE (date, id) < (last_date, last_id). The index
+-- must match that order exactly so every page is a short range scan
+-- instead of skipping OFFSET rows.
+
+-- /api/transactions, /api/dashboard: ORDER BY transaction_date DESC NULLS LAST, id DESC
+CREATE INDEX IF NOT EXISTS idx_sheet_transactions_user_keyset
+ON sheet_transactions (LOWER(client_username), transaction_date DESC NULLS LAST, id DESC);
+
+-- Superseded: DESC defaults to NULLS FIRST, so it can't serve the order above
+DROP INDEX IF EXISTS idx_transactions_lower_user_date;
+
+-- TransactionRepository / InteractionRepository: ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_transactions_user_keyset
+ON transactions (user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_interactions_user_keyset
+ON interactions (user_id, created_at DESC, id DESC);
@@ -0,0 +1,109 @@
+-- Canonical client key: LOWER(client_username) without the leading '@'
+-- ('@Name', '@name', 'name' -> 'name'). Filled by GoogleSheetsSync
+-- (row_parser.normalize_client_key). The API computes the same key from
+-- initData, so every client-scoped query is one equality on client_key
+-- instead of LOWER()/OR over two spellings.
+
+-- 1. sheet_transactions
+ALTER TABLE sheet_transactions ADD COLUMN IF NOT EXISTS client_key VARCHAR(255);
+
+UPDATE sheet_transactions
+SET client_key = NULLIF(LOWER(LTRIM(BTRIM(client_username), '@')), '')
+WHERE client_key IS NULL AND client_username IS NOT NULL;
+
+-- Listing order (keyset pagination) + equality lookups by client
+CREATE INDEX IF NOT EXISTS idx_sheet_transactions_client_key
+ON sheet_transactions (client_key, transaction_date DESC NULLS LAST, id DESC);
+
+-- LOWER(client_username) indexes (008, 009, 013) are no longer used
+DROP INDEX IF EXISTS idx_sheet_transactions_user_keyset;
+DROP INDEX IF EXISTS idx_transactions_lower_client_username;
+DROP INDEX IF EXISTS idx_transactions_lower_user_withdrawal;
+
+-- 2. Balances (upserted by the sync on client_username)
+ALTER TABLE balances_paypal ADD COLUMN IF NOT EXISTS client_key VARCHAR(255);
+ALTER TABLE balances_stripe ADD COLUMN IF NOT EXISTS client_key VARCHAR(255);
+ALTER TABLE balances_paypal_withdrawal ADD COLUMN IF NOT EXISTS client_key VARCHAR(255);
+
+UPDATE balances_paypal SET client_key = NULLIF(LOWER(LTRIM(BTRIM(client_username), '@')), '')
+WHERE client_key IS NULL AND client_username IS NOT NULL;
+UPDATE balances_stripe SET client_key = NULLIF(LOWER(LTRIM(BTRIM(client_username), '@')), '')
+WHERE client_key IS NULL AND client_username IS NOT NULL;
+UPDATE balances_paypal_withdrawal SET client_key = NULLIF(LOWER(LTRIM(BTRIM(client_username), '@')), '')
+WHERE client_key IS NULL AND client_username IS NOT NULL;
+
+-- Several spellings of one client may exist: the API takes the latest synced row
+CREATE INDEX IF NOT EXISTS idx_balances_paypal_client_key
+ON balances_paypal (client_key, last_synced_at DESC);
+CREATE INDEX IF NOT EXISTS idx_balances_stripe_client_key
+ON balances_stripe (client_key, last_synced_at DESC);
+CREATE INDEX IF NOT EXISTS idx_balances_paypal_withdrawal_client_key
+ON balances_paypal_withdrawal (client_key, last_synced_at DESC);
+
+-- 3. client_thresholds is written by the sheet_transactions trigger and by
+-- hand (threshold_amount overrides), not by the sync: derive the key in the DB
+ALTER TABLE client_thresholds ADD COLUMN IF NOT EXISTS client_key VARCHAR(255)
+GENERATED ALWAYS AS (NULLIF(LOWER(LTRIM(BTRIM(client_username), '@')), '')) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_client_thresholds_client_key
+ON client_thresholds (client_key, last_updated_at DESC);
+
+-- 4. client_aggregates: keyed by client_key instead of LOWER(client_username).
+-- Derived data, rebuilt from sheet_transactions.
+DROP TABLE IF EXISTS client_aggregates_monthly;
+DROP TABLE IF EXISTS client_aggregates;
+
+CREATE TABLE client_aggregates (
+    client_key VARCHAR(255) PRIMARY KEY,
+    total_checks INT NOT NULL DEFAULT 0,
+    total_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,       -- SUM(withdrawal_amount)
+    avg_check DECIMAL(18, 2) NOT NULL DEFAULT 0,       -- AVG(withdrawal_amount)
+    total_gross DECIMAL(18, 2) NOT NULL DEFAULT 0,     -- SUM(amount_gross), premium access
+    dated_checks INT NOT NULL DEFAULT 0,               -- checks with transaction_date
+    dated_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    months_active INT NOT NULL DEFAULT 0,              -- number of monthly buckets
+    all_rows INT NOT NULL DEFAULT 0,                   -- all transactions, any status
+    last_transaction_date DATE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE client_aggregates_monthly (
+    client_key VARCHAR(255) NOT NULL,
+    month DATE NOT NULL,
+    checks_count INT NOT NULL DEFAULT 0,
+    withdrawal_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    gross_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (client_key, month)
+);
+
+INSERT INTO client_aggregates_monthly (client_key, month, checks_count, withdrawal_sum, gross_sum)
+SELECT
+    client_key,
+    DATE_TRUNC('month', transaction_date)::date,
+    COUNT(*),
+    COALESCE(SUM(withdrawal_amount), 0),
+    COALESCE(SUM(amount_gross), 0)
+FROM sheet_transactions
+WHERE client_key IS NOT NULL
+  AND withdrawal_received = TRUE
+  AND transaction_date IS NOT NULL
+GROUP BY 1, 2;
+
+INSERT INTO client_aggregates (
+    client_key, total_checks, total_sum, avg_check, total_gross,
+    dated_checks, dated_sum, months_active, all_rows, last_transaction_date
+)
+SELECT
+    client_key,
+    COUNT(*) FILTER (WHERE withdrawal_received),
+    COALESCE(SUM(withdrawal_amount) FILTER (WHERE withdrawal_received), 0),
+    COALESCE(AVG(withdrawal_amount) FILTER (WHERE withdrawal_received), 0),
+    COALESCE(SUM(amount_gross) FILTER (WHERE withdrawal_received), 0),
+    COUNT(*) FILTER (WHERE withdrawal_received AND transaction_date IS NOT NULL),
+    COALESCE(SUM(withdrawal_amount) FILTER (WHERE withdrawal_received AND transaction_date IS NOT NULL), 0),
+    COUNT(DISTINCT DATE_TRUNC('month', transaction_date)) FILTER (WHERE withdrawal_received),
+    COUNT(*),
+    MAX(transaction_date)
+FROM sheet_transactions
+WHERE client_key IS NOT NULL
+GROUP BY 1;
@@ -0,0 +1,61 @@
+-- Buyer lookup (/api/buyer/lookup, /api/buyer/search).
+-- buyer_email holds the free-form "Реквизиты покупателя" cell (mixed case,
+-- stray spaces), so exact matches on it miss. GoogleSheetsSync now stores a
+-- normalized buyer_key (row_parser.normalize_buyer_key) and keeps a
+-- per-buyer summary row, the API answers from one indexed row.
+
+-- pg_trgm for the fuzzy search mode (needs CREATE privilege on the database)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 1. Normalized key on transactions
+ALTER TABLE sheet_transactions ADD COLUMN IF NOT EXISTS buyer_key VARCHAR(255);
+
+UPDATE sheet_transactions
+SET buyer_key = NULLIF(LOWER(REGEXP_REPLACE(buyer_email, '\s+', '', 'g')), '')
+WHERE buyer_key IS NULL AND buyer_email IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_sheet_transactions_buyer_key
+ON sheet_transactions (buyer_key);
+
+-- Raw buyer_email index (008) is superseded
+DROP INDEX IF EXISTS idx_transactions_buyer_email;
+
+-- 2. Per-buyer summary, refreshed by the sync for touched buyers
+CREATE TABLE IF NOT EXISTS buyer_summary (
+    buyer_key VARCHAR(255) PRIMARY KEY,
+    buyer_email VARCHAR(255),                          -- one original spelling, for display
+    transactions INT NOT NULL DEFAULT 0,
+    total_gross DECIMAL(18, 2) NOT NULL DEFAULT 0,     -- SUM(amount_gross)
+    total_net DECIMAL(18, 2) NOT NULL DEFAULT 0,       -- SUM(withdrawal_amount)
+    first_seen DATE,
+    last_seen DATE,
+    unique_partners INT NOT NULL DEFAULT 0,            -- distinct client_key
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Prefix mode: buyer_key LIKE 'abc%'
+CREATE INDEX IF NOT EXISTS idx_buyer_summary_key_prefix
+ON buyer_summary (buyer_key varchar_pattern_ops);
+
+-- Fuzzy mode: buyer_key % 'abc' (trigram similarity)
+CREATE INDEX IF NOT EXISTS idx_buyer_summary_key_trgm
+ON buyer_summary USING gin (buyer_key gin_trgm_ops);
+
+-- 3. Initial backfill
+INSERT INTO buyer_summary (
+    buyer_key, buyer_email, transactions, total_gross, total_net,
+    first_seen, last_seen, unique_partners
+)
+SELECT
+    buyer_key,
+    MIN(buyer_email),
+    COUNT(*),
+    COALESCE(SUM(amount_gross), 0),
+    COALESCE(SUM(withdrawal_amount), 0),
+    MIN(transaction_date),
+    MAX(transaction_date),
+    COUNT(DISTINCT client_key)
+FROM sheet_transactions
+WHERE buyer_key IS NOT NULL
+GROUP BY 1
+ON CONFLICT (buyer_key) DO NOTHING;
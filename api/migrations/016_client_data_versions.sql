@@ -0,0 +1,10 @@
+-- Persisted data version per client, the source of the API's ETags.
+-- notify_clients_changed() (sheets_sync/client_events.py) bumps the rows of
+-- the changed clients in the same transaction as the data and the NOTIFY.
+-- client_key '*' is the version of "all clients" (sync_service_v2 balances),
+-- it is part of every client's ETag.
+CREATE TABLE IF NOT EXISTS client_data_versions (
+    client_key VARCHAR(255) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
@@ -3,22 +3,26 @@ from typing import AsyncGenerator
 
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
-    create_async_engine,
     async_sessionmaker,
     AsyncEngine
 )
 
 from bot.config import settings
 from bot.database.models import Base
+from common.db_engine import create_db_engine, pool_stats
 
 
 class DatabaseManager:
     def __init__(self, url: str) -> None:
-        self._engine: AsyncEngine = create_async_engine(
+        self._engine: AsyncEngine = create_db_engine(
             url,
-            echo=False,
-            pool_size=10,
-            max_overflow=20
+            name="bot",
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+            prepared_statement_cache_size=settings.DB_PREPARED_STATEMENT_CACHE_SIZE
         )
         self._session_factory = async_sessionmaker(
             bind=self._engine,
@@ -49,5 +53,8 @@ class DatabaseManager:
     def get_session(self) -> AsyncSession:
         return self._session_factory()
 
+    def pool_stats(self) -> dict:
+        return pool_stats(self._engine)
+
 
 db_manager = DatabaseManager(settings.DATABASE_URL)
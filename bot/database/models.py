@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Text, Boolean, Integer
+from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Text, Boolean, Integer, Index, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -36,6 +36,9 @@ class User(Base):
 
 class Interaction(Base):
     __tablename__ = "interactions"
+    __table_args__ = (
+        Index("idx_interactions_user_keyset", "user_id", text("created_at DESC"), text("id DESC")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
@@ -51,6 +54,9 @@ class Interaction(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("idx_transactions_user_keyset", "user_id", text("created_at DESC"), text("id DESC")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
@@ -96,3 +102,27 @@ class LegacyReferral(Base):
     username: Mapped[str] = mapped_column(String(255), primary_key=True)
     referral_code: Mapped[str] = mapped_column(String(50))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class SheetsOutbox(Base):
+    """Tickets waiting to be exported to Google Sheets (drained by SheetsOutboxWorker)"""
+    __tablename__ = "sheets_outbox"
+    __table_args__ = (
+        Index("idx_sheets_outbox_pending", "next_attempt_at", "id", postgresql_where=text("status = 'pending'")),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    transaction_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("transactions.id"), nullable=True)
+
+    username: Mapped[str] = mapped_column(String(255))
+    payment_method: Mapped[str] = mapped_column(String(50))
+    amount: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending / done / failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    sheet_row: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Optional, Union
+
+SortValue = Optional[Union[date, datetime]]
+
+# Page size bounds for every cursor-paginated endpoint (API and web app)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidPageSize(ValueError):
+    pass
+
+
+def parse_page_size(raw: Optional[str], default: int = DEFAULT_PAGE_SIZE) -> int:
+    """?limit= from a query string: an integer in 1..MAX_PAGE_SIZE"""
+    if raw is None or raw == "":
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise InvalidPageSize(f"limit must be an integer, got {raw!r}") from None
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise InvalidPageSize(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+def encode_cursor(sort_value: SortValue, row_id: int) -> str:
+    """
+    Opaque keyset cursor for the last row of a page: (sort column, id).
+    The client passes it back as-is to get the next page.
+    """
+    payload = json.dumps(
+        [sort_value.isoformat() if sort_value is not None else None, row_id],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[SortValue, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(row_id, int):
+            raise TypeError("id must be an integer")
+        if raw_value is None:
+            return None, row_id
+        # DATE columns serialize as YYYY-MM-DD, DATETIME ones carry a time part
+        if len(raw_value) == 10:
+            return date.fromisoformat(raw_value), row_id
+        return datetime.fromisoformat(raw_value), row_id
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def split_page(rows: list, limit: int, key: Callable[[Any], tuple[SortValue, int]]) -> tuple[list, Optional[str]]:
+    """
+    rows are fetched with LIMIT limit + 1: the extra row only tells that
+    there is a next page. Returns (page, next_cursor or None).
+    """
+    if limit < 1:
+        raise InvalidPageSize("limit must be positive")
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(*key(page[-1]))
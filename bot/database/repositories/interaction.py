@@ -1,7 +1,8 @@
 import json
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.database.models import Interaction
@@ -32,14 +33,19 @@ class InteractionRepository:
         self,
         user_id: int,
         limit: int = 50,
-        offset: int = 0
+        before: Optional[tuple[datetime, int]] = None
     ) -> list[Interaction]:
+        """
+        Newest first. Keyset pagination: `before` is (created_at, id) of the
+        last row of the previous page, so every page is one index range scan.
+        """
+        query = select(Interaction).where(Interaction.user_id == user_id)
+        if before is not None:
+            query = query.where(tuple_(Interaction.created_at, Interaction.id) < tuple_(*before))
         result = await self._session.execute(
-            select(Interaction)
-            .where(Interaction.user_id == user_id)
-            .order_by(Interaction.created_at.desc())
+            query
+            .order_by(Interaction.created_at.desc(), Interaction.id.desc())
             .limit(limit)
-            .offset(offset)
         )
         return list(result.scalars().all())
 
@@ -60,3 +66,14 @@ class InteractionRepository:
     async def get_total_count(self) -> int:
         result = await self._session.execute(select(func.count(Interaction.id)))
         return result.scalar() or 0
+
+    async def get_estimated_count(self) -> int:
+        """
+        Planner estimate from pg_class.reltuples (updated by VACUUM/ANALYZE).
+        Returns -1 if the table was never analyzed.
+        """
+        result = await self._session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'interactions'::regclass")
+        )
+        value = result.scalar()
+        return -1 if value is None else int(value)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.database.models import Transaction
@@ -55,14 +55,19 @@ class TransactionRepository:
         self,
         user_id: int,
         limit: int = 50,
-        offset: int = 0
+        before: Optional[tuple[datetime, int]] = None
     ) -> list[Transaction]:
+        """
+        Newest first. Keyset pagination: `before` is (created_at, id) of the
+        last row of the previous page, so every page is one index range scan.
+        """
+        query = select(Transaction).where(Transaction.user_id == user_id)
+        if before is not None:
+            query = query.where(tuple_(Transaction.created_at, Transaction.id) < tuple_(*before))
         result = await self._session.execute(
-            select(Transaction)
-            .where(Transaction.user_id == user_id)
-            .order_by(Transaction.created_at.desc())
+            query
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc())
             .limit(limit)
-            .offset(offset)
         )
         return list(result.scalars().all())
 
@@ -89,3 +94,10 @@ class TransactionRepository:
             select(func.count(Transaction.id)).where(Transaction.status == status)
         )
         return result.scalar() or 0
+
+    async def get_counts_by_status(self) -> dict[str, int]:
+        """All statuses in one grouped query"""
+        result = await self._session.execute(
+            select(Transaction.status, func.count(Transaction.id)).group_by(Transaction.status)
+        )
+        return {row[0]: row[1] for row in result.all()}
@@ -3,9 +3,11 @@ from typing import Optional
 
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from aiogram.types import User as TgUser
 
 from bot.database.models import User, Interaction, Transaction
+from bot.database.user_cache import user_cache
 
 
 class UserRepository:
@@ -13,8 +15,11 @@ class UserRepository:
         self._session = session
 
     async def get_by_id(self, user_id: int) -> Optional[User]:
+        # populate_existing: a user attached from user_cache may already be in
+        # the session with a stale snapshot (the API and other workers don't
+        # invalidate this process' cache) - reads before writes get the DB row
         result = await self._session.execute(
-            select(User).where(User.id == user_id)
+            select(User).where(User.id == user_id).execution_options(populate_existing=True)
         )
         return result.scalar_one_or_none()
 
@@ -31,7 +36,19 @@ class UserRepository:
         await self._session.flush()
         return user
 
+    async def _attach_cached(self, snapshot: dict) -> User:
+        """Put a cached user into the session without a SELECT"""
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return await self._session.merge(user, load=False)
+
     async def get_or_create(self, tg_user: TgUser) -> tuple[User, bool]:
+        # Fast path: known user, profile unchanged -> no DB round trip
+        cached = user_cache.get(tg_user.id)
+        if cached is not None and user_cache.profile_matches(cached, tg_user):
+            user_cache.touch(tg_user.id)
+            return await self._attach_cached(cached), False
+
         user = await self.get_by_id(tg_user.id)
         if user:
             user.last_active_at = datetime.utcnow()
@@ -42,6 +59,7 @@ class UserRepository:
             if tg_user.last_name:
                 user.last_name = tg_user.last_name
             await self._session.flush()
+            user_cache.put(user)
             return user, False
 
         # Create new user
@@ -60,6 +78,7 @@ class UserRepository:
                 await self._session.delete(legacy)
                 await self._session.flush()
 
+        user_cache.put(user)
         return user, True
 
     async def update_webapp_visit(self, user_id: int) -> None:
@@ -68,6 +87,7 @@ class UserRepository:
             user.webapp_sessions += 1
             user.webapp_last_visit = datetime.utcnow()
             await self._session.flush()
+            user_cache.invalidate(user_id)
 
     async def get_total_count(self) -> int:
         result = await self._session.execute(select(func.count(User.id)))
@@ -114,6 +134,7 @@ class UserRepository:
         if user:
             user.is_blocked = is_blocked
             await self._session.flush()
+            user_cache.invalidate(user_id)
             return True
         return False
 
@@ -134,6 +155,7 @@ class UserRepository:
         if user:
             user.referral_code = new_code
             await self._session.flush()
+            user_cache.invalidate(user_id)
             return True
         return False
 
@@ -153,6 +175,6 @@ class UserRepository:
             if referrer and referrer.id != user.id:
                 user.referrer_id = referrer.id
                 await self._session.flush()
-                await self._session.flush()
+                user_cache.invalidate(user_id)
                 return referrer
         return None
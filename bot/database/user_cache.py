@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import inspect, update
+
+from bot.config import settings
+from bot.database.models import User
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FIELDS = ("username", "first_name", "last_name")
+
+
+class UserCache:
+    """
+    Short-lived cache of users rows keyed by Telegram id, used by
+    UserRepository.get_or_create.
+
+    A hit (profile fields unchanged, entry younger than USER_CACHE_TTL_SECONDS)
+    needs no SELECT and no UPDATE: last_active_at is recorded in memory and
+    written for all users at once every USER_ACTIVITY_FLUSH_SECONDS.
+    Repository methods that change a user call invalidate().
+
+    The cache is per process: writes from the API or another worker are not
+    seen until the entry expires. Decisions on mutable columns (referral_code,
+    referrer_id, is_blocked, webapp_*) must use UserRepository.get_by_id(),
+    which reloads the row.
+    """
+
+    def __init__(self, ttl: float, max_size: int, flush_interval: float) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+
+        self._entries: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self._activity: dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user: User) -> None:
+        """Cache a column snapshot of a flushed user"""
+        snapshot = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        self._entries[user.id] = (time.monotonic(), snapshot)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        # last_active_at was just written by the caller
+        self._activity.pop(user.id, None)
+
+    def invalidate(self, user_id: int) -> None:
+        self._entries.pop(user_id, None)
+
+    @staticmethod
+    def profile_matches(snapshot: dict, tg_user) -> bool:
+        # Same rule as get_or_create: empty Telegram values never overwrite
+        for field in PROFILE_FIELDS:
+            value = getattr(tg_user, field, None)
+            if value and value != snapshot.get(field):
+                return False
+        return True
+
+    def touch(self, user_id: int) -> None:
+        """Remember activity; written by the periodic batched UPDATE"""
+        self._activity[user_id] = datetime.utcnow()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush_activity(self) -> int:
+        if not self._activity:
+            return 0
+        pending, self._activity = self._activity, {}
+
+        from bot.database.connection import db_manager
+
+        try:
+            async with db_manager.session() as session:
+                await session.execute(
+                    update(User),
+                    [{"id": user_id, "last_active_at": ts} for user_id, ts in pending.items()]
+                )
+        except Exception as e:
+            logger.error(f"last_active_at flush failed ({len(pending)} users): {e}")
+            self._restore(pending)
+            return 0
+        except asyncio.CancelledError:
+            self._restore(pending)
+            raise
+        return len(pending)
+
+    def _restore(self, pending: dict[int, datetime]) -> None:
+        # Keep the newest value for the next attempt
+        for user_id, ts in pending.items():
+            self._activity.setdefault(user_id, ts)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_activity()
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush_activity()
+
+
+user_cache = UserCache(
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    flush_interval=settings.USER_ACTIVITY_FLUSH_SECONDS
+)
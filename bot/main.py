@@ -9,9 +9,13 @@ from aiohttp import web
 
 from bot.config import settings
 from bot.database.connection import db_manager
+from bot.database.user_cache import user_cache
 from bot.middlewares import DatabaseMiddleware, TrackingMiddleware
 from bot.routers import get_main_router
+from bot.services.interaction_buffer import interaction_buffer
 from bot.services.logger import telegram_logger
+from bot.services.session_tracker import session_tracker
+from bot.services.sheets_outbox import sheets_outbox_worker
 from bot.webapp.api import create_app
 
 logging.basicConfig(
@@ -43,7 +47,6 @@ async def start_bot() -> None:
         logger.info("Bot is running...")
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
-        await telegram_logger.close()
         await bot.session.close()
 
 
@@ -71,12 +74,22 @@ async def main() -> None:
     await db_manager.init_db()
     logger.info("Database initialized")
 
+    outbox_task = asyncio.create_task(sheets_outbox_worker.run_forever())
+
     try:
         await asyncio.gather(
             start_bot(),
             # start_api()  # API provided by api/main.py
         )
     finally:
+        outbox_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await outbox_task
+        await interaction_buffer.close()
+        await user_cache.close()
+        # Sends the last ended-sessions digest: close before the logger
+        await session_tracker.close()
+        await telegram_logger.close()
         await db_manager.close()
 
 
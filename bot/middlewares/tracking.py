@@ -4,7 +4,8 @@ from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message, CallbackQuery
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.database.repositories import UserRepository, InteractionRepository
+from bot.database.repositories import UserRepository
+from bot.services.interaction_buffer import interaction_buffer
 from bot.services.session_tracker import session_tracker
 
 
@@ -20,7 +21,6 @@ class TrackingMiddleware(BaseMiddleware):
             return await handler(event, data)
 
         user_repo = UserRepository(session)
-        interaction_repo = InteractionRepository(session)
 
         user = None
         interaction_type = "unknown"
@@ -62,7 +62,8 @@ class TrackingMiddleware(BaseMiddleware):
                 session_tracker.track_action(user, readable_action)
 
         if user and action:
-            await interaction_repo.create(
+            # Written in batches by the buffer, not in this request's session
+            await interaction_buffer.add(
                 user_id=user.id,
                 interaction_type=interaction_type,
                 action=action
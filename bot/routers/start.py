@@ -81,6 +81,9 @@ async def cmd_start(
 ) -> None:
     user = message.from_user
     user_repo = UserRepository(session)
+    # db_user may come from the per-process user cache: reload before
+    # deciding on referral_code / referrer_id (the API can change them)
+    db_user = await user_repo.get_by_id(db_user.id) or db_user
 
     # 1. Generate Referral Code for new user if None (or existing without one)
     if not db_user.referral_code:
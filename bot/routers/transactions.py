@@ -235,12 +235,10 @@ async def confirm_transaction(callback: CallbackQuery, state: FSMContext, sessio
         currency="USD"
     )
 
-    # Export to Google Sheets
+    # Export to Google Sheets (outbox, written by SheetsOutboxWorker)
     try:
-        logger.info(f"Attempting to export transaction {transaction.id} to Google Sheets...")
         from bot.services.sheets_writer import sheets_writer
-        await sheets_writer.append_ticket(transaction, db_user)
-        logger.info(f"Export to Google Sheets requested for transaction {transaction.id}")
+        await sheets_writer.enqueue_ticket(session, transaction, db_user)
     except Exception as e:
         logger.error(f"Sheets Export Failed: {e}", exc_info=True)
     
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import settings
+from bot.database.repositories import UserRepository, InteractionRepository, TransactionRepository
+
+
+@dataclass(frozen=True)
+class CountersSnapshot:
+    users: int
+    interactions: int
+    interactions_approx: bool
+    transactions: int
+    by_status: dict[str, int] = field(default_factory=dict)
+    taken_at: datetime = field(default_factory=datetime.now)
+
+    def status(self, name: str) -> int:
+        return self.by_status.get(name, 0)
+
+    @property
+    def interactions_label(self) -> str:
+        return f"~{self.interactions}" if self.interactions_approx else str(self.interactions)
+
+
+class AdminCounters:
+    """
+    Totals for the admin panel, cached for ADMIN_COUNTERS_TTL_SECONDS.
+
+    Transactions are counted with one grouped status query. For the
+    interactions table the pg_class.reltuples estimate is used once it is
+    above ADMIN_COUNTERS_APPROX_THRESHOLD rows; exact COUNT(*) below that.
+    Concurrent refreshes share one query.
+    """
+
+    def __init__(self, ttl: float, approx_threshold: int) -> None:
+        self.ttl = ttl
+        self.approx_threshold = approx_threshold
+        self._snapshot: CountersSnapshot | None = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _load(self, session: AsyncSession) -> CountersSnapshot:
+        interaction_repo = InteractionRepository(session)
+
+        by_status = await TransactionRepository(session).get_counts_by_status()
+        users = await UserRepository(session).get_total_count()
+
+        interactions = await interaction_repo.get_estimated_count()
+        approx = interactions >= self.approx_threshold
+        if not approx:
+            interactions = await interaction_repo.get_total_count()
+
+        return CountersSnapshot(
+            users=users,
+            interactions=interactions,
+            interactions_approx=approx,
+            transactions=sum(by_status.values()),
+            by_status=by_status
+        )
+
+    async def get(self, session: AsyncSession, force: bool = False) -> CountersSnapshot:
+        if not force and self._snapshot and time.monotonic() < self._expires_at:
+            return self._snapshot
+
+        async with self._lock:
+            # Another caller may have refreshed while we waited
+            if not force and self._snapshot and time.monotonic() < self._expires_at:
+                return self._snapshot
+            self._snapshot = await self._load(session)
+            self._expires_at = time.monotonic() + self.ttl
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        self._expires_at = 0.0
+
+
+admin_counters = AdminCounters(
+    ttl=settings.ADMIN_COUNTERS_TTL_SECONDS,
+    approx_threshold=settings.ADMIN_COUNTERS_APPROX_THRESHOLD
+)
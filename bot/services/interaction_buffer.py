@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import settings
+from bot.database.connection import db_manager
+from bot.database.models import Interaction
+
+logger = logging.getLogger(__name__)
+
+# Queue sentinel: flush what was collected and stop the background task
+_STOP = object()
+
+
+class InteractionBuffer:
+    """
+    In-process buffer for the interactions table.
+
+    add() only puts the event into a bounded queue; a background task writes
+    the queue with one multi-row INSERT every `max_batch` events or
+    `flush_interval_ms` milliseconds, whichever comes first. When the queue
+    is full, add() waits for free space (backpressure) instead of growing
+    memory. close() drains everything that is left.
+
+    Rows that fail in a batch (e.g. the user row is not committed yet) are
+    retried one by one and re-queued up to `max_retries` times.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        max_batch: int = 200,
+        flush_interval_ms: int = 500,
+        max_size: int = 10000,
+        max_retries: int = 5
+    ) -> None:
+        self._session_factory = session_factory
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_size = max_size
+        self.max_retries = max_retries
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._retry: list[tuple[dict, int]] = []
+        self._closing = False
+
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    def _ensure_started(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._queue
+
+    async def add(
+        self,
+        user_id: int,
+        interaction_type: str,
+        action: str,
+        data: Optional[dict] = None
+    ) -> None:
+        if self._closing:
+            return
+        queue = self._ensure_started()
+        await queue.put({
+            "user_id": user_id,
+            "interaction_type": interaction_type,
+            "action": action,
+            "data": json.dumps(data) if data else None,
+            "created_at": datetime.utcnow()
+        })
+
+    @property
+    def pending(self) -> int:
+        return (self._queue.qsize() if self._queue else 0) + len(self._retry)
+
+    async def _collect(self) -> tuple[list[tuple[dict, int]], bool]:
+        """Wait for the first event, then gather up to max_batch within flush_interval"""
+        queue = self._queue
+        batch = self._retry[:self.max_batch]
+        del self._retry[:len(batch)]
+
+        if not batch:
+            item = await queue.get()
+            if item is _STOP:
+                return batch, True
+            batch.append((item, 0))
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append((item, 0))
+        return batch, False
+
+    def _drain_nowait(self) -> list[tuple[dict, int]]:
+        batch = self._retry[:self.max_batch]
+        del self._retry[:len(batch)]
+        while len(batch) < self.max_batch and self._queue and not self._queue.empty():
+            batch.append((self._queue.get_nowait(), 0))
+        return batch
+
+    async def _write(self, batch: list[tuple[dict, int]]) -> None:
+        rows = [row for row, _ in batch]
+        try:
+            async with self._session_factory() as session:
+                await session.execute(insert(Interaction), rows)
+                await session.commit()
+            self.written += len(rows)
+            return
+        except Exception as e:
+            logger.warning(f"Interaction batch insert failed ({len(rows)} rows): {e}")
+
+        # Row by row: keep the good ones, retry the rest later
+        async with self._session_factory() as session:
+            for row, attempts in batch:
+                try:
+                    async with session.begin_nested():
+                        await session.execute(insert(Interaction), [row])
+                    self.written += 1
+                except Exception:
+                    if attempts + 1 < self.max_retries and not self._closing:
+                        self._retry.append((row, attempts + 1))
+                    else:
+                        self.dropped += 1
+            await session.commit()
+
+    async def _run(self) -> None:
+        while True:
+            batch, stop = await self._collect()
+            if batch:
+                self.flushes += 1
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    logger.error(f"Interaction buffer flush error: {e}", exc_info=True)
+            if stop:
+                return
+
+    async def close(self) -> None:
+        """Stop the background task and write everything still buffered"""
+        self._closing = True
+        if self._task and not self._task.done():
+            await self._queue.put(_STOP)
+            await self._task
+        self._task = None
+
+        while True:
+            batch = self._drain_nowait()
+            if not batch:
+                break
+            await self._write(batch)
+        logger.info(f"Interaction buffer closed: {self.written} written, {self.dropped} dropped")
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+        }
+
+
+def create_interaction_buffer(session_factory: Callable[[], AsyncSession]) -> InteractionBuffer:
+    return InteractionBuffer(
+        session_factory,
+        max_batch=settings.INTERACTION_BUFFER_MAX_BATCH,
+        flush_interval_ms=settings.INTERACTION_BUFFER_FLUSH_MS,
+        max_size=settings.INTERACTION_BUFFER_MAX_SIZE
+    )
+
+
+# Bot process (TrackingMiddleware, bot/webapp/api.py); api/main.py has its own
+interaction_buffer = create_interaction_buffer(db_manager.get_session)
@@ -1,20 +1,184 @@
+import asyncio
+import logging
+import re
+import time
+from collections import deque
 from datetime import datetime
 from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
 from aiogram.types import User
 
 from bot.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Telegram message length limit
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+
+def truncate_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> str:
+    """
+    Cut an HTML message to `limit` chars at a line boundary, so a tag is
+    not split in half (Telegram rejects the whole message then).
+    A first line longer than the limit is cut and sent without tags.
+    """
+    if len(text) <= limit:
+        return text
+    cut = text.rfind("\n", 0, limit)
+    if cut > 0:
+        return text[:cut].rstrip()
+    plain = re.sub(r"<[^>]*(>|$)", "", text[:limit])
+    return re.sub(r"&#?\w*$", "", plain)
+
+
+class TokenBucket:
+    """`rate` tokens per second, at most `capacity` accumulated"""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def drain(self, seconds: float) -> None:
+        """Telegram asked to wait (429): no tokens until then"""
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
 
 class TelegramLogger:
+    """
+    Logs to LOG_CHAT_ID through a background dispatcher.
+
+    log_* / send_log only put the message into a bounded queue and return
+    immediately. The dispatcher sends at most LOG_RATE_PER_MINUTE messages
+    (token bucket, LOG_BURST burst) and merges everything that queued up while
+    waiting into digest messages (up to 4096 chars). On 429 it waits
+    retry_after and resends; other errors are retried LOG_MAX_ATTEMPTS times.
+    When the queue is full the oldest message is dropped.
+    """
+
     def __init__(self) -> None:
         self._bot: Bot | None = None
 
+        self.max_queue = settings.LOG_QUEUE_SIZE
+        self.max_attempts = settings.LOG_MAX_ATTEMPTS
+        self._bucket = TokenBucket(settings.LOG_RATE_PER_MINUTE / 60, settings.LOG_BURST)
+        self._queue: deque[str] = deque()
+        self._wakeup: asyncio.Event | None = None
+        # Set by the dispatcher when the queue is empty and nothing is being sent
+        self._idle: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+        # Metrics
+        self.sent = 0
+        self.digests = 0
+        self.dropped = 0
+        self.retries = 0
+        self.failed = 0
+
     @property
     def bot(self) -> Bot:
         if self._bot is None:
             self._bot = Bot(token=settings.LOG_BOT_TOKEN)
         return self._bot
 
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "sent": self.sent,
+            "digests": self.digests,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
+
+    def _ensure_dispatcher(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._dispatch())
+
+    async def send_log(self, text: str) -> None:
+        """Queue an HTML message for the log chat (never waits on Telegram)"""
+        self._ensure_dispatcher()
+        if len(self._queue) >= self.max_queue:
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append(truncate_message(text))
+        self._idle.clear()
+        self._wakeup.set()
+
+    def _next_message(self) -> tuple[str, int]:
+        """Merge queued messages into one digest that fits the length limit"""
+        parts = [self._queue.popleft()]
+        length = len(parts[0])
+        while self._queue and length + len(DIGEST_SEPARATOR) + len(self._queue[0]) <= MAX_MESSAGE_LENGTH:
+            part = self._queue.popleft()
+            parts.append(part)
+            length += len(DIGEST_SEPARATOR) + len(part)
+        return DIGEST_SEPARATOR.join(parts), len(parts)
+
+    async def _send(self, text: str) -> bool:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.bot.send_message(
+                    chat_id=settings.LOG_CHAT_ID,
+                    text=text,
+                    parse_mode="HTML"
+                )
+                return True
+            except TelegramRetryAfter as e:
+                self.retries += 1
+                self._bucket.drain(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                self.retries += 1
+                logger.warning(f"Log message failed (attempt {attempt}): {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+        return False
+
+    async def _dispatch(self) -> None:
+        while True:
+            if not self._queue:
+                # Reached only after the previous digest's _send finished
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # Wait for a token first: whatever arrives meanwhile joins the digest
+            await self._bucket.acquire()
+            if not self._queue:
+                continue
+
+            text, count = self._next_message()
+            if await self._send(text):
+                self.sent += count
+                if count > 1:
+                    self.digests += 1
+            else:
+                self.failed += count
+                logger.error(f"Dropped {count} log messages after {self.max_attempts} attempts")
+
     async def log_new_user(self, user: User) -> None:
         username = f"@{user.username}" if user.username else "No username"
         language = user.language_code or "unknown"
@@ -27,11 +191,7 @@ class TelegramLogger:
             f"🕐 Время: {current_time}"
         )
 
-        await self.bot.send_message(
-            chat_id=settings.LOG_CHAT_ID,
-            text=message,
-            parse_mode="HTML"
-        )
+        await self.send_log(message)
 
     async def log_session_end(
         self,
@@ -72,11 +232,43 @@ class TelegramLogger:
             f"🕐 Время: {current_time}"
         )
 
-        await self.bot.send_message(
-            chat_id=settings.LOG_CHAT_ID,
-            text=message,
-            parse_mode="HTML"
-        )
+        await self.send_log(message)
+
+    async def log_sessions_ended(self, sessions: list) -> None:
+        """Ended sessions as a few summary messages instead of one per session"""
+        lines = []
+        for session in sessions:
+            username = f"@{session.username}" if session.username else "No username"
+            duration = session.get_duration_seconds()
+            duration_str = f"{duration}с" if duration < 60 else f"{duration // 60}м {duration % 60}с"
+
+            if session.action_count >= 10:
+                engagement = "🟢"
+            elif session.action_count >= 5:
+                engagement = "🟡"
+            else:
+                engagement = "🔴"
+
+            actions = " → ".join(session.get_last_actions()[-3:])
+            lines.append(
+                f"{engagement} {username} (<code>{session.user_id}</code>) "
+                f"⏱ {duration_str}, 🔢 {session.action_count}"
+                + (f"\n    {actions}" if actions else "")
+            )
+
+        current_time = datetime.now().strftime("%H:%M:%S")
+        chunk, length = [], 0
+        for i, line in enumerate(lines):
+            chunk.append(line)
+            length += len(line) + 1
+            if length > MAX_MESSAGE_LENGTH - 200 or i == len(lines) - 1:
+                message = (
+                    f"📊 <b>Сессии завершены ({len(chunk)})</b>\n\n"
+                    + "\n".join(chunk)
+                    + f"\n\n🕐 Время: {current_time}"
+                )
+                await self.send_log(message)
+                chunk, length = [], 0
 
     async def log_transaction(self, user: User, payment_method: str) -> None:
         username = f"@{user.username}" if user.username else "No username"
@@ -89,13 +281,24 @@ class TelegramLogger:
             f"🕐 Время: {current_time}"
         )
 
-        await self.bot.send_message(
-            chat_id=settings.LOG_CHAT_ID,
-            text=message,
-            parse_mode="HTML"
-        )
+        await self.send_log(message)
 
-    async def close(self) -> None:
+    async def close(self, timeout: float = 10) -> None:
+        """Send what is still queued (up to `timeout` seconds), then close the bot session"""
+        if self._task:
+            if not self._task.done():
+                # Idle, not just an empty queue: a popped digest may still be in _send
+                idle = asyncio.create_task(self._idle.wait())
+                await asyncio.wait({idle, self._task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                idle.cancel()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._idle is not None and not self._idle.is_set():
+            logger.warning(f"Log dispatcher stopped before draining, {len(self._queue)} messages still queued")
         if self._bot:
             await self._bot.session.close()
 
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import signal
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import Settings, settings
+from bot.database.connection import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Latest row per client (a client may have rows under several spellings)
+THRESHOLDS_QUERY = text("""
+    SELECT DISTINCT ON (client_key)
+        client_key, total_earnings, threshold_amount, threshold_reached, can_view_data
+    FROM client_thresholds
+    WHERE client_key IS NOT NULL
+    ORDER BY client_key, last_updated_at DESC
+""")
+
+
+@dataclass(frozen=True)
+class ClientThreshold:
+    total_earnings: float
+    threshold_amount: float
+    threshold_reached: bool
+    can_view_data: bool
+
+
+class PermissionsRegistry:
+    """
+    Admin ids and per-client thresholds kept in memory, so permission
+    checks are set/dict lookups instead of env parsing and queries.
+
+    Admin ids come from settings.ADMIN_IDS. Thresholds are loaded from
+    client_thresholds by start() and then every `refresh_interval`
+    seconds. reload() re-reads both (ADMIN_IDS from the environment/.env)
+    and is bound to SIGHUP by install_signal_handler().
+    Until the first load threshold() returns None for every client.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        admin_ids: list[int],
+        refresh_interval: float = 60
+    ) -> None:
+        self._session_factory = session_factory
+        self.refresh_interval = refresh_interval
+
+        self._admin_ids: frozenset[int] = frozenset(admin_ids)
+        self._thresholds: dict[str, ClientThreshold] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.loads = 0
+        self.failures = 0
+
+    @property
+    def admin_ids(self) -> frozenset[int]:
+        return self._admin_ids
+
+    def is_admin(self, user_id: Optional[int]) -> bool:
+        return user_id in self._admin_ids
+
+    def threshold(self, client_key: Optional[str]) -> Optional[ClientThreshold]:
+        return self._thresholds.get(client_key) if client_key else None
+
+    async def load_thresholds(self) -> int:
+        try:
+            async with self._session_factory() as session:
+                rows = (await session.execute(THRESHOLDS_QUERY)).fetchall()
+        except Exception as e:
+            # Keep serving the previous snapshot
+            self.failures += 1
+            logger.error(f"client_thresholds load failed: {e}")
+            return 0
+
+        # Swap the whole dict: readers never see a half-built snapshot
+        self._thresholds = {
+            client_key: ClientThreshold(
+                total_earnings=float(earnings) if earnings else 0.0,
+                threshold_amount=float(amount) if amount else 500.0,
+                threshold_reached=bool(reached),
+                can_view_data=bool(can_view)
+            )
+            for client_key, earnings, amount, reached, can_view in rows
+        }
+        self.loads += 1
+        return len(self._thresholds)
+
+    def reload_admin_ids(self) -> None:
+        try:
+            self._admin_ids = frozenset(Settings().ADMIN_IDS)
+        except Exception as e:
+            logger.error(f"ADMIN_IDS reload failed, keeping {len(self._admin_ids)} ids: {e}")
+
+    async def reload(self) -> None:
+        self.reload_admin_ids()
+        count = await self.load_thresholds()
+        logger.info(f"Permissions reloaded: {len(self._admin_ids)} admins, {count} client thresholds")
+
+    async def start(self) -> None:
+        await self.load_thresholds()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.load_thresholds()
+
+    def install_signal_handler(self, sig: int = getattr(signal, "SIGHUP", 0)) -> None:
+        """`kill -HUP <pid>` reloads permissions (no-op where unsupported)"""
+        if not sig:
+            return
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                sig, lambda: asyncio.create_task(self.reload())
+            )
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "admins": len(self._admin_ids),
+            "thresholds": len(self._thresholds),
+            "loads": self.loads,
+            "failures": self.failures,
+        }
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def create_permissions_registry(session_factory: Callable[[], AsyncSession]) -> PermissionsRegistry:
+    return PermissionsRegistry(
+        session_factory,
+        admin_ids=settings.ADMIN_IDS,
+        refresh_interval=settings.PERMISSIONS_REFRESH_SECONDS
+    )
+
+
+# Bot/logbot processes; api/main.py has its own
+permissions = create_permissions_registry(db_manager.get_session)
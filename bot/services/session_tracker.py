@@ -1,72 +1,196 @@
-from dataclasses import dataclass, field
-from datetime import datetime
-from collections import deque
+import asyncio
+import heapq
+import logging
+import time
 
 from aiogram.types import User
 
+from bot.config import settings
 from bot.services.logger import telegram_logger
 
+logger = logging.getLogger(__name__)
+
+# Only the last few actions are shown in the session log
+LAST_ACTIONS = 5
+
 
-@dataclass
 class UserSession:
-    user_id: int
-    username: str | None
-    start_time: datetime = field(default_factory=datetime.now)
-    last_activity: datetime = field(default_factory=datetime.now)
-    actions: deque = field(default_factory=lambda: deque(maxlen=10))
-    action_count: int = 0
+    __slots__ = ("user_id", "username", "start_time", "last_activity", "actions", "action_count")
+
+    def __init__(self, user_id: int, username: str | None) -> None:
+        now = time.time()
+        self.user_id = user_id
+        self.username = username
+        self.start_time = now
+        self.last_activity = now
+        self.actions: list[str] = []
+        self.action_count = 0
 
     def add_action(self, action: str) -> None:
-        self.last_activity = datetime.now()
-        self.actions.append((datetime.now(), action))
+        self.last_activity = time.time()
+        self.actions.append(action)
+        if len(self.actions) > LAST_ACTIONS:
+            del self.actions[0]
         self.action_count += 1
 
     def get_duration_seconds(self) -> int:
-        return int((self.last_activity - self.start_time).total_seconds())
+        return int(self.last_activity - self.start_time)
 
     def get_last_actions(self) -> list[str]:
-        return [action for _, action in self.actions]
+        return list(self.actions)
 
 
 class SessionTracker:
-    def __init__(self) -> None:
+    """
+    Active bot sessions, one UserSession per user.
+
+    A session ends after `idle_timeout` seconds without actions. Deadlines
+    live in a min-heap with lazy updates: track_action only touches the
+    session, and the sweeper re-pushes entries whose user was active since.
+    The heap therefore holds about one entry per session. Over `max_sessions`
+    the least recently active sessions are evicted. Ended sessions
+    (expired or evicted) are logged in batches through telegram_logger.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = 900,
+        max_sessions: int = 100_000,
+        sweep_interval: float = 30
+    ) -> None:
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+
         self._sessions: dict[int, UserSession] = {}
+        self._deadlines: list[tuple[float, int]] = []
+        self._ended: list[UserSession] = []
+        self._task: asyncio.Task | None = None
+
+        # Counters
+        self.expired = 0
+        self.evicted = 0
+        self.logged = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._sessions)
 
     def get_or_create_session(self, user: User) -> UserSession:
-        if user.id not in self._sessions:
-            self._sessions[user.id] = UserSession(
-                user_id=user.id,
-                username=user.username
-            )
-        return self._sessions[user.id]
+        session = self._sessions.get(user.id)
+        if session is None:
+            session = self._sessions[user.id] = UserSession(user.id, user.username)
+            heapq.heappush(self._deadlines, (session.last_activity + self.idle_timeout, user.id))
+            if len(self._sessions) > self.max_sessions:
+                self._evict_oldest()
+            self._ensure_sweeper()
+        return session
 
     def track_action(self, user: User, action: str) -> None:
         session = self.get_or_create_session(user)
         session.add_action(action)
 
-    async def end_session_and_log(self, user: User) -> None:
-        if user.id not in self._sessions:
+    def _pop_due(self, now: float | None) -> UserSession | None:
+        """
+        Pop the session with the earliest real deadline if it is due
+        (now=None: pop it regardless, used for eviction).
+        """
+        heap = self._deadlines
+        while heap:
+            deadline, user_id = heap[0]
+            session = self._sessions.get(user_id)
+            if session is None:
+                heapq.heappop(heap)          # ended explicitly
+                continue
+            actual = session.last_activity + self.idle_timeout
+            if actual > deadline:
+                heapq.heapreplace(heap, (actual, user_id))  # active since: move back
+                continue
+            if now is not None and deadline > now:
+                return None
+            heapq.heappop(heap)
+            return self._sessions.pop(user_id)
+        return None
+
+    def _evict_oldest(self) -> None:
+        session = self._pop_due(None)
+        if session:
+            self.evicted += 1
+            self._ended.append(session)
+
+    def expire_idle(self) -> int:
+        now = time.time()
+        count = 0
+        while (session := self._pop_due(now)) is not None:
+            self._ended.append(session)
+            count += 1
+        self.expired += count
+        return count
+
+    async def flush_ended(self) -> None:
+        if not self._ended:
             return
+        ended, self._ended = self._ended, []
+        try:
+            await telegram_logger.log_sessions_ended(ended)
+            self.logged += len(ended)
+        except Exception as e:
+            logger.error(f"Failed to log {len(ended)} ended sessions: {e}")
+
+    def _ensure_sweeper(self) -> None:
+        if self._task is None or self._task.done():
+            try:
+                self._task = asyncio.get_running_loop().create_task(self._sweep())
+            except RuntimeError:
+                pass  # no loop (sync usage/tests): expire_idle() can be called manually
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.expire_idle()
+            await self.flush_ended()
 
-        session = self._sessions[user.id]
-        duration = session.get_duration_seconds()
-        actions = session.get_last_actions()
+    async def end_session_and_log(self, user: User) -> None:
+        session = self._sessions.pop(user.id, None)
+        if session is None:
+            return
 
         await telegram_logger.log_session_end(
             user=user,
-            duration_seconds=duration,
+            duration_seconds=session.get_duration_seconds(),
             action_count=session.action_count,
-            last_actions=actions
+            last_actions=session.get_last_actions()
         )
 
-        del self._sessions[user.id]
-
     def get_session(self, user_id: int) -> UserSession | None:
         return self._sessions.get(user_id)
 
     def clear_session(self, user_id: int) -> None:
-        if user_id in self._sessions:
-            del self._sessions[user_id]
-
-
-session_tracker = SessionTracker()
+        self._sessions.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "heap": len(self._deadlines),
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "logged": self.logged,
+            "pending_log": len(self._ended),
+        }
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.expire_idle()
+        await self.flush_ended()
+
+
+session_tracker = SessionTracker(
+    idle_timeout=settings.SESSION_IDLE_MINUTES * 60,
+    max_sessions=settings.SESSION_MAX_ACTIVE
+)
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from bot.config import settings
+from bot.database.connection import db_manager
+from bot.database.models import SheetsOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsOutboxWorker:
+    """
+    Drains sheets_outbox: pending tickets are written to Google Sheets in
+    batches (one batch_update per flush). On failure the batch is retried
+    with exponential backoff; after SHEETS_OUTBOX_MAX_ATTEMPTS it is marked failed.
+
+    Runs in the bot process only: the free-row cache of SheetsWriter assumes
+    a single writer.
+    """
+
+    def __init__(self) -> None:
+        self.batch_size = settings.SHEETS_OUTBOX_BATCH_SIZE
+        self.poll_interval = settings.SHEETS_OUTBOX_POLL_SECONDS
+        self.max_attempts = settings.SHEETS_OUTBOX_MAX_ATTEMPTS
+        self.backoff_base = settings.SHEETS_OUTBOX_BACKOFF_SECONDS
+        self.backoff_max = 600
+
+        self.written = 0
+        self.failed_flushes = 0
+
+    def _backoff(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max))
+
+    async def flush(self) -> int:
+        """Write one batch of due tickets. Returns the number written."""
+        from bot.services.sheets_writer import sheets_writer
+
+        async with db_manager.session() as session:
+            result = await session.execute(
+                select(SheetsOutbox)
+                .where(
+                    SheetsOutbox.status == "pending",
+                    SheetsOutbox.next_attempt_at <= datetime.utcnow()
+                )
+                .order_by(SheetsOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            tickets = list(result.scalars().all())
+            if not tickets:
+                return 0
+
+            try:
+                row_numbers = await sheets_writer.write_tickets(tickets)
+            except Exception as e:
+                self.failed_flushes += 1
+                now = datetime.utcnow()
+                for ticket in tickets:
+                    ticket.attempts += 1
+                    ticket.last_error = str(e)[:1000]
+                    if ticket.attempts >= self.max_attempts:
+                        ticket.status = "failed"
+                    else:
+                        ticket.next_attempt_at = now + self._backoff(ticket.attempts)
+                logger.error(
+                    f"Sheets export failed for {len(tickets)} tickets "
+                    f"(attempt {tickets[0].attempts}): {e}"
+                )
+                return 0
+
+            now = datetime.utcnow()
+            for ticket, row_number in zip(tickets, row_numbers):
+                ticket.status = "done"
+                ticket.sheet_row = row_number
+                ticket.processed_at = now
+                ticket.last_error = None
+
+            self.written += len(tickets)
+            return len(tickets)
+
+    async def run_forever(self) -> None:
+        logger.info("Sheets outbox worker started")
+        while True:
+            try:
+                written = await self.flush()
+            except Exception as e:
+                logger.error(f"Sheets outbox worker error: {e}", exc_info=True)
+                written = 0
+
+            # Full batch -> more may be waiting, don't sleep
+            if written < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+
+sheets_outbox_worker = SheetsOutboxWorker()
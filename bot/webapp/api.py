@@ -2,15 +2,23 @@ import hashlib
 import hmac
 import json
 from datetime import datetime
+from functools import partial
 from typing import Any
 from urllib.parse import parse_qsl, unquote
 
 from aiohttp import web
-from aiohttp.web import Request, Response, json_response
+from aiohttp.web import Request, Response
 
 from bot.config import settings
 from bot.database.connection import db_manager
+from bot.database.pagination import InvalidCursor, InvalidPageSize, decode_cursor, parse_page_size, split_page
 from bot.database.repositories import UserRepository, InteractionRepository, TransactionRepository
+from bot.database.user_cache import user_cache
+from bot.services.interaction_buffer import interaction_buffer
+from common.fast_json import dumps_str
+
+# orjson instead of the stdlib json for every response
+json_response = partial(web.json_response, dumps=dumps_str)
 
 
 def validate_init_data(init_data: str, bot_token: str) -> dict | None:
@@ -117,12 +125,16 @@ async def get_user_interactions(request: Request) -> Response:
         return json_response({"error": "User not found"}, status=400)
 
     user_id = tg_user["id"]
-    limit = int(request.query.get("limit", 50))
-    offset = int(request.query.get("offset", 0))
+    try:
+        limit = parse_page_size(request.query.get("limit"))
+        before = decode_cursor(request.query["cursor"]) if request.query.get("cursor") else None
+    except (InvalidCursor, InvalidPageSize) as e:
+        return json_response({"error": str(e)}, status=400)
 
     async with db_manager.session() as session:
         interaction_repo = InteractionRepository(session)
-        interactions = await interaction_repo.get_user_interactions(user_id, limit, offset)
+        interactions = await interaction_repo.get_user_interactions(user_id, limit + 1, before)
+        interactions, next_cursor = split_page(interactions, limit, lambda i: (i.created_at, i.id))
 
         return json_response({
             "interactions": [
@@ -134,7 +146,8 @@ async def get_user_interactions(request: Request) -> Response:
                     "created_at": i.created_at.isoformat()
                 }
                 for i in interactions
-            ]
+            ],
+            "next_cursor": next_cursor
         })
 
 
@@ -145,12 +158,16 @@ async def get_user_transactions(request: Request) -> Response:
         return json_response({"error": "User not found"}, status=400)
 
     user_id = tg_user["id"]
-    limit = int(request.query.get("limit", 50))
-    offset = int(request.query.get("offset", 0))
+    try:
+        limit = parse_page_size(request.query.get("limit"))
+        before = decode_cursor(request.query["cursor"]) if request.query.get("cursor") else None
+    except (InvalidCursor, InvalidPageSize) as e:
+        return json_response({"error": str(e)}, status=400)
 
     async with db_manager.session() as session:
         transaction_repo = TransactionRepository(session)
-        transactions = await transaction_repo.get_user_transactions(user_id, limit, offset)
+        transactions = await transaction_repo.get_user_transactions(user_id, limit + 1, before)
+        transactions, next_cursor = split_page(transactions, limit, lambda tx: (tx.created_at, tx.id))
 
         return json_response({
             "transactions": [
@@ -164,7 +181,8 @@ async def get_user_transactions(request: Request) -> Response:
                     "completed_at": tx.completed_at.isoformat() if tx.completed_at else None
                 }
                 for tx in transactions
-            ]
+            ],
+            "next_cursor": next_cursor
         })
 
 
@@ -226,14 +244,12 @@ async def log_webapp_event(request: Request) -> Response:
 
     user_id = tg_user["id"]
 
-    async with db_manager.session() as session:
-        interaction_repo = InteractionRepository(session)
-        await interaction_repo.create(
-            user_id=user_id,
-            interaction_type=f"webapp_{event_type}",
-            action=action,
-            data=event_data
-        )
+    await interaction_buffer.add(
+        user_id=user_id,
+        interaction_type=f"webapp_{event_type}",
+        action=action,
+        data=event_data
+    )
 
     return json_response({"status": "ok"})
 
@@ -336,6 +352,7 @@ async def create_referral_code(request: Request) -> Response:
         if user:
             user.referral_code = code
             await session.commit()
+            user_cache.invalidate(user_id)
 
             return json_response({
                 "code": code,
@@ -0,0 +1 @@
+# Shared by the API, the bots and the sheets sync: no imports from bot/, api/ or sheets_sync/
@@ -0,0 +1,158 @@
+"""
+Shared async engine factory for the API, the bots and the sync service.
+
+Every process builds its engine with create_db_engine(), so pool settings
+and metrics are the same everywhere:
+
+- pool_size / max_overflow – persistent and extra connections per process
+  (the sum over all processes must stay below Postgres max_connections);
+- pool_timeout – seconds to wait for a free connection before raising;
+- pool_recycle – reconnect connections older than this (seconds, -1 = never),
+  pool_pre_ping drops connections closed by the server;
+- statement_cache_size – asyncpg per-connection prepared statement cache,
+  prepared_statement_cache_size – SQLAlchemy asyncpg adapter cache
+  (set both to 0 behind pgbouncer in transaction mode).
+
+API and sync read the DB_* variables with pool_options_from_env(), the bots
+take the same names from bot.config.settings. pool_stats(engine): pool
+size, checked-out connections, overflow and connection wait time.
+"""
+import os
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidated = 0
+        self.timeouts = 0       # pool_timeout reached, request failed
+        self.waits = 0          # checkouts that had to wait/connect (> 1 ms)
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        if timed_out:
+            self.timeouts += 1
+        if seconds > 0.001:
+            self.waits += 1
+            self.wait_total += seconds
+            if seconds > self.wait_max:
+                self.wait_max = seconds
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "invalidated": self.invalidated,
+            "timeouts": self.timeouts,
+            "waits": self.waits,
+            "wait_avg_ms": round(self.wait_total / self.waits * 1000, 2) if self.waits else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+def _timed_pool_class(metrics: PoolMetrics):
+    """
+    Queue pool that measures how long a checkout waits for a connection
+    (free slot or a new connect). A subclass rather than an attribute so
+    that engine.dispose(), which recreates the pool from its class, keeps it.
+    """
+    class TimedQueuePool(AsyncAdaptedQueuePool):
+        pool_metrics = metrics
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except PoolTimeout:
+                metrics.record_wait(time.perf_counter() - started, timed_out=True)
+                raise
+            metrics.record_wait(time.perf_counter() - started)
+            return conn
+
+    return TimedQueuePool
+
+
+def pool_options_from_env(**defaults) -> Dict[str, Any]:
+    """DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_STATEMENT_CACHE_SIZE, DB_PREPARED_STATEMENT_CACHE_SIZE over per-service defaults"""
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', defaults.get('pool_size', 10))),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', defaults.get('max_overflow', 20))),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', defaults.get('pool_timeout', 30))),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', defaults.get('pool_recycle', 1800))),
+        'statement_cache_size': int(os.getenv('DB_STATEMENT_CACHE_SIZE', defaults.get('statement_cache_size', 100))),
+        'prepared_statement_cache_size': int(os.getenv(
+            'DB_PREPARED_STATEMENT_CACHE_SIZE', defaults.get('prepared_statement_cache_size', 100)
+        )),
+    }
+
+
+def create_db_engine(
+    url: str,
+    name: str,
+    pool_size: int = 10,
+    max_overflow: int = 20,
+    pool_timeout: float = 30,
+    pool_recycle: int = 1800,
+    statement_cache_size: int = 100,
+    prepared_statement_cache_size: int = 100,
+    echo: bool = False
+) -> AsyncEngine:
+    metrics = PoolMetrics(name)
+
+    connect_args: Dict[str, Any] = {}
+    if '+asyncpg' in url:
+        connect_args = {
+            'statement_cache_size': statement_cache_size,
+            'prepared_statement_cache_size': prepared_statement_cache_size,
+        }
+
+    engine = create_async_engine(
+        url,
+        echo=echo,
+        poolclass=_timed_pool_class(metrics),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=True,
+        connect_args=connect_args
+    )
+
+    pool = engine.sync_engine.pool
+
+    @event.listens_for(pool, 'connect')
+    def _on_connect(dbapi_conn, record):
+        metrics.connects += 1
+
+    @event.listens_for(pool, 'checkout')
+    def _on_checkout(dbapi_conn, record, proxy):
+        metrics.checkouts += 1
+
+    @event.listens_for(pool, 'invalidate')
+    def _on_invalidate(dbapi_conn, record, exc):
+        metrics.invalidated += 1
+
+    return engine
+
+
+def pool_stats(engine: AsyncEngine) -> Dict[str, Any]:
+    pool = engine.sync_engine.pool
+    metrics = getattr(pool, 'pool_metrics', None)
+    if metrics is None:
+        return {"size": pool.size(), "checked_out": pool.checkedout()}
+    return metrics.snapshot(pool)
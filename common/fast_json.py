@@ -0,0 +1,86 @@
+"""
+Fast JSON path for row-heavy responses of the API (api/main.py) and the
+bot web app (bot/webapp/api.py).
+
+Transaction pages and the dashboard are built from DB rows straight into
+plain dicts/lists and rendered with orjson in one call: no per-row Pydantic
+model, no validation and no jsonable_encoder pass. The JSON is the same as
+the response models produce (api/benchmark_json.py checks parity).
+
+orjson handles date/datetime natively, Decimal is written as a float
+(the models declare these fields as float). Without orjson installed the
+stdlib json module is used with the same output.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dumps_str(obj: Any) -> str:
+    """For APIs that expect str (aiohttp json_response(dumps=...))"""
+    return dumps(obj).decode()
+
+
+def transaction_items(rows: Iterable) -> List[dict]:
+    """
+    Rows of TRANSACTIONS_PAGE_QUERIES (id, payment_system, amount_gross,
+    transaction_date, status) -> the Transaction model's JSON
+    """
+    now = None
+    items = []
+    for row_id, payment_system, amount, transaction_date, status in rows:
+        if transaction_date is not None:
+            created_at = transaction_date.isoformat()
+        else:
+            if now is None:
+                now = datetime.now().isoformat()
+            created_at = now
+        items.append({
+            "id": row_id,
+            "payment_method": payment_system or "Unknown",
+            "amount": float(amount) if amount else 0.0,
+            "created_at": created_at,
+            "status": status,
+        })
+    return items
+
+
+def transactions_payload(rows: Iterable, total: Optional[int], next_cursor: Optional[str]) -> dict:
+    """TransactionsResponse as a plain dict"""
+    return {
+        "transactions": transaction_items(rows),
+        "total": total,
+        "next_cursor": next_cursor,
+    }
+
+
+def with_leading_field(name: str, value: Any, rendered_object: bytes) -> bytes:
+    """
+    Prepend one field to an already rendered JSON object:
+    ('access', {...}, b'{"balance":...}') -> b'{"access":{...},"balance":...}'.
+    Lets a cached body be reused with a per-request field.
+    """
+    head = b'{' + dumps(name) + b':' + dumps(value)
+    if rendered_object == b'{}':
+        return head + b'}'
+    return head + b',' + rendered_object[1:]
@@ -9,6 +9,7 @@ from aiogram.enums import ParseMode
 from bot.config import settings
 from bot.database.connection import db_manager
 from bot.middlewares import DatabaseMiddleware
+from bot.services.permissions import permissions
 from logbot.routers import get_logbot_router
 
 logging.basicConfig(
@@ -24,6 +25,9 @@ async def main() -> None:
     await db_manager.init_db()
     logger.info("Database initialized")
 
+    # kill -HUP: re-read ADMIN_IDS without a restart
+    permissions.install_signal_handler()
+
     bot = Bot(
         token=settings.LOG_BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
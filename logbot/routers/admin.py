@@ -7,6 +7,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.config import settings
 from bot.database.repositories import UserRepository, InteractionRepository, TransactionRepository
+from bot.services.admin_counters import admin_counters, CountersSnapshot
+from bot.services.permissions import permissions
 from logbot.keyboards.admin import (
     get_admin_main_keyboard,
     get_user_detail_keyboard,
@@ -23,7 +25,17 @@ class AdminStates(StatesGroup):
 
 
 def is_admin(user_id: int) -> bool:
-    return user_id in settings.ADMIN_IDS or user_id == settings.LOG_CHAT_ID
+    return permissions.is_admin(user_id) or user_id == settings.LOG_CHAT_ID
+
+
+def admin_panel_text(counters: CountersSnapshot) -> str:
+    return (
+        "🔐 <b>Admin Panel</b>\n\n"
+        f"👥 Total Users: <b>{counters.users}</b>\n"
+        f"📊 Total Interactions: <b>{counters.interactions_label}</b>\n"
+        f"💳 Total Transactions: <b>{counters.transactions}</b>\n\n"
+        "Select an option below:"
+    )
 
 
 @router.message(Command("admin"))
@@ -33,21 +45,8 @@ async def admin_panel(message: Message, session: AsyncSession) -> None:
         await message.answer("⛔ Access denied. This bot is for admins only.")
         return
 
-    user_repo = UserRepository(session)
-    interaction_repo = InteractionRepository(session)
-    transaction_repo = TransactionRepository(session)
-
-    total_users = await user_repo.get_total_count()
-    total_interactions = await interaction_repo.get_total_count()
-    total_transactions = await transaction_repo.get_total_count()
-
-    text = (
-        "🔐 <b>Admin Panel</b>\n\n"
-        f"👥 Total Users: <b>{total_users}</b>\n"
-        f"📊 Total Interactions: <b>{total_interactions}</b>\n"
-        f"💳 Total Transactions: <b>{total_transactions}</b>\n\n"
-        "Select an option below:"
-    )
+    counters = await admin_counters.get(session)
+    text = admin_panel_text(counters)
 
     await message.answer(
         text=text,
@@ -64,21 +63,8 @@ async def admin_main(callback: CallbackQuery, session: AsyncSession, state: FSMC
         await callback.answer("⛔ Access denied.", show_alert=True)
         return
 
-    user_repo = UserRepository(session)
-    interaction_repo = InteractionRepository(session)
-    transaction_repo = TransactionRepository(session)
-
-    total_users = await user_repo.get_total_count()
-    total_interactions = await interaction_repo.get_total_count()
-    total_transactions = await transaction_repo.get_total_count()
-
-    text = (
-        "🔐 <b>Admin Panel</b>\n\n"
-        f"👥 Total Users: <b>{total_users}</b>\n"
-        f"📊 Total Interactions: <b>{total_interactions}</b>\n"
-        f"💳 Total Transactions: <b>{total_transactions}</b>\n\n"
-        "Select an option below:"
-    )
+    counters = await admin_counters.get(session)
+    text = admin_panel_text(counters)
 
     await callback.answer()
     await callback.message.edit_text(
@@ -94,30 +80,21 @@ async def admin_stats(callback: CallbackQuery, session: AsyncSession) -> None:
         await callback.answer("⛔ Access denied.", show_alert=True)
         return
 
-    user_repo = UserRepository(session)
-    interaction_repo = InteractionRepository(session)
-    transaction_repo = TransactionRepository(session)
-
-    total_users = await user_repo.get_total_count()
-    total_interactions = await interaction_repo.get_total_count()
-    total_transactions = await transaction_repo.get_total_count()
-
-    pending = await transaction_repo.get_total_by_status("pending")
-    completed = await transaction_repo.get_total_by_status("completed")
-    failed = await transaction_repo.get_total_by_status("failed")
+    counters = await admin_counters.get(session)
 
     text = (
         "📊 <b>Detailed Statistics</b>\n\n"
         f"👥 <b>Users</b>\n"
-        f"   Total: {total_users}\n\n"
+        f"   Total: {counters.users}\n\n"
         f"📊 <b>Interactions</b>\n"
-        f"   Total: {total_interactions}\n"
-        f"   Avg per user: {total_interactions / max(total_users, 1):.1f}\n\n"
+        f"   Total: {counters.interactions_label}\n"
+        f"   Avg per user: {counters.interactions / max(counters.users, 1):.1f}\n\n"
         f"💳 <b>Transactions</b>\n"
-        f"   Total: {total_transactions}\n"
-        f"   ⏳ Pending: {pending}\n"
-        f"   ✅ Completed: {completed}\n"
-        f"   ❌ Failed: {failed}"
+        f"   Total: {counters.transactions}\n"
+        f"   ⏳ Pending: {counters.status('pending')}\n"
+        f"   ✅ Completed: {counters.status('completed')}\n"
+        f"   ❌ Failed: {counters.status('failed')}\n\n"
+        f"🕐 Updated: {counters.taken_at.strftime('%H:%M:%S')}"
     )
 
     await callback.answer()
@@ -287,19 +264,14 @@ async def admin_transactions(callback: CallbackQuery, session: AsyncSession) ->
         await callback.answer("⛔ Access denied.", show_alert=True)
         return
 
-    transaction_repo = TransactionRepository(session)
-
-    total = await transaction_repo.get_total_count()
-    pending = await transaction_repo.get_total_by_status("pending")
-    completed = await transaction_repo.get_total_by_status("completed")
-    failed = await transaction_repo.get_total_by_status("failed")
+    counters = await admin_counters.get(session)
 
     text = (
         "💳 <b>Transactions Overview</b>\n\n"
-        f"📊 Total: {total}\n"
-        f"⏳ Pending: {pending}\n"
-        f"✅ Completed: {completed}\n"
-        f"❌ Failed: {failed}"
+        f"📊 Total: {counters.transactions}\n"
+        f"⏳ Pending: {counters.status('pending')}\n"
+        f"✅ Completed: {counters.status('completed')}\n"
+        f"❌ Failed: {counters.status('failed')}"
     )
 
     await callback.answer()
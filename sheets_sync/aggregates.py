@@ -0,0 +1,116 @@
+"""
+Derived tables rebuilt from sheet_transactions by every sync service.
+
+- client_aggregates (+ client_aggregates_monthly): statistics, access
+  thresholds and totals served by the API;
+- buyer_summary: /api/buyer/lookup and /api/buyer/search.
+
+Both are recomputed only for the keys a sync touched, inside the caller's
+transaction, so readers never see new rows with old aggregates.
+refresh_client_aggregates() also queues the client_data_changed
+notification for those clients (sheets_sync/client_events.py).
+"""
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from sheets_sync.client_events import notify_clients_changed
+
+
+async def refresh_client_aggregates(session: AsyncSession, client_keys: Iterable[str]) -> int:
+    """Recompute client_aggregates (+ monthly buckets) for the given clients"""
+    clients = sorted({key for key in client_keys if key})
+    if not clients:
+        return 0
+
+    params = {'clients': clients}
+    await session.execute(
+        text("DELETE FROM client_aggregates_monthly WHERE client_key = ANY(:clients)"),
+        params
+    )
+    await session.execute(
+        text("""
+            INSERT INTO client_aggregates_monthly (client_key, month, checks_count, withdrawal_sum, gross_sum)
+            SELECT
+                client_key,
+                DATE_TRUNC('month', transaction_date)::date,
+                COUNT(*),
+                COALESCE(SUM(withdrawal_amount), 0),
+                COALESCE(SUM(amount_gross), 0)
+            FROM sheet_transactions
+            WHERE client_key = ANY(:clients)
+              AND withdrawal_received = TRUE
+              AND transaction_date IS NOT NULL
+            GROUP BY 1, 2
+        """),
+        params
+    )
+    await session.execute(
+        text("DELETE FROM client_aggregates WHERE client_key = ANY(:clients)"),
+        params
+    )
+    await session.execute(
+        text("""
+            INSERT INTO client_aggregates (
+                client_key, total_checks, total_sum, avg_check, total_gross,
+                dated_checks, dated_sum, months_active, all_rows, last_transaction_date,
+                updated_at
+            )
+            SELECT
+                client_key,
+                COUNT(*) FILTER (WHERE withdrawal_received),
+                COALESCE(SUM(withdrawal_amount) FILTER (WHERE withdrawal_received), 0),
+                COALESCE(AVG(withdrawal_amount) FILTER (WHERE withdrawal_received), 0),
+                COALESCE(SUM(amount_gross) FILTER (WHERE withdrawal_received), 0),
+                COUNT(*) FILTER (WHERE withdrawal_received AND transaction_date IS NOT NULL),
+                COALESCE(SUM(withdrawal_amount) FILTER (WHERE withdrawal_received AND transaction_date IS NOT NULL), 0),
+                COUNT(DISTINCT DATE_TRUNC('month', transaction_date)) FILTER (WHERE withdrawal_received),
+                COUNT(*),
+                MAX(transaction_date),
+                CURRENT_TIMESTAMP
+            FROM sheet_transactions
+            WHERE client_key = ANY(:clients)
+            GROUP BY 1
+        """),
+        params
+    )
+    # Delivered on commit: the API drops cached responses of these clients
+    await notify_clients_changed(session, clients)
+    return len(clients)
+
+
+async def refresh_buyer_summary(session: AsyncSession, buyer_keys: Iterable[str]) -> int:
+    """Recompute buyer_summary for the given buyers"""
+    buyers = sorted({key for key in buyer_keys if key})
+    if not buyers:
+        return 0
+
+    params = {'buyers': buyers}
+    await session.execute(
+        text("DELETE FROM buyer_summary WHERE buyer_key = ANY(:buyers)"),
+        params
+    )
+    await session.execute(
+        text("""
+            INSERT INTO buyer_summary (
+                buyer_key, buyer_email, transactions, total_gross, total_net,
+                first_seen, last_seen, unique_partners, updated_at
+            )
+            SELECT
+                buyer_key,
+                MIN(buyer_email),
+                COUNT(*),
+                COALESCE(SUM(amount_gross), 0),
+                COALESCE(SUM(withdrawal_amount), 0),
+                MIN(transaction_date),
+                MAX(transaction_date),
+                COUNT(DISTINCT client_key),
+                CURRENT_TIMESTAMP
+            FROM sheet_transactions
+            WHERE buyer_key = ANY(:buyers)
+            GROUP BY 1
+        """),
+        params
+    )
+    return len(buyers)
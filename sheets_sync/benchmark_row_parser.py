@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark: columnar row parser vs the previous row-wise path.
+
+    python sheets_sync/benchmark_row_parser.py [rows]
+
+Generates synthetic payments-sheet rows (default 100k), parses them with both
+implementations, checks that the output is identical and prints timings.
+"""
+import random
+import sys
+import time
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sheets_sync.row_parser import (
+    ROW_WIDTH, normalize_buyer_key, normalize_client_key,
+    parse_transaction_columns, parse_transaction_rows
+)
+
+MONTHS = ['января', 'февраля', 'марта', 'апреля', 'мая', 'июня', 'Июль',
+          'августа', 'сентября', 'октября', 'ноября', 'декабря', '7', 'неизв']
+AMOUNTS = ['100', '1250.50', '105,02', '1,000.50', '$ 300', '', '9E+20', 'abc', '-12.5']
+BOOLS = ['Да', 'да', 'нет', '', '+', 'received', 'No']
+
+
+# --- Previous row-wise implementation (GoogleSheetsSync before the columnar parser) ---
+
+def legacy_parse_date(day: str, month: str, year: str) -> Optional[date]:
+    MONTH_MAP = {
+        'январь': 1, 'января': 1,
+        'февраль': 2, 'февраля': 2,
+        'март': 3, 'марта': 3,
+        'апрель': 4, 'апреля': 4,
+        'май': 5, 'мая': 5,
+        'июнь': 6, 'июня': 6,
+        'июль': 7, 'июля': 7,
+        'август': 8, 'августа': 8,
+        'сентябрь': 9, 'сентября': 9,
+        'октябрь': 10, 'октября': 10,
+        'ноябрь': 11, 'ноября': 11,
+        'декабрь': 12, 'декабря': 12
+    }
+    try:
+        d = int(day) if day else 1
+        m = 1
+        if month:
+            clean_month = month.strip().lower()
+            if clean_month.isdigit():
+                m = int(clean_month)
+            else:
+                m = MONTH_MAP.get(clean_month, 1)
+        y = int(year) if year else datetime.now().year
+        if y < 100: y += 2000
+        if y < 1900 or y > 2100: y = datetime.now().year
+        return date(y, m, d)
+    except (ValueError, TypeError):
+        return None
+
+
+def legacy_parse_decimal(value: str, field_name: str = "") -> Decimal:
+    if not value:
+        return Decimal('0')
+    cleaned = str(value).replace('$', '').replace(' ', '').strip()
+    if ',' in cleaned:
+        if '.' in cleaned:
+            cleaned = cleaned.replace(',', '')
+        else:
+            cleaned = cleaned.replace(',', '.')
+    try:
+        val = Decimal(cleaned)
+        if abs(val) >= Decimal('100000000'):
+            return Decimal('0')
+        return val
+    except (InvalidOperation, ValueError):
+        return Decimal('0')
+
+
+def legacy_parse_boolean(value: str) -> bool:
+    if not value:
+        return False
+    return str(value).lower().strip() in ['да', 'yes', 'true', '1', '+', 'received', 'done']
+
+
+def legacy_parse_int(value: str) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        val_f = float(str(value).replace(',', '.').strip())
+        if abs(val_f) > 9223372036854775807:
+            return None
+        return int(val_f)
+    except (ValueError, TypeError):
+        return None
+
+
+def legacy_parse(rows, row_numbers, row_hashes):
+    result = []
+    for row, row_num, row_hash in zip(rows, row_numbers, row_hashes):
+        def get(idx): return row[idx].strip()
+
+        result.append({
+            'client_username': get(0),
+            'client_key': normalize_client_key(get(0)),
+            'transaction_date': legacy_parse_date(get(4), get(5), get(6)),
+            'payment_id': legacy_parse_int(get(7)),
+            'amount_gross': float(legacy_parse_decimal(get(8), 'amount')),
+            'payment_system': get(9),
+            'buyer_email': get(10),
+            'buyer_key': normalize_buyer_key(get(10)),
+            'intermediary_status': get(11),
+            'credential_type': get(12),
+            'client_credentials': get(13),
+            'ali_commission': float(legacy_parse_decimal(get(14), 'ali_comm')),
+            'p2p_commission': float(legacy_parse_decimal(get(15), 'p2p_comm')),
+            'paypal_commission': float(legacy_parse_decimal(get(16), 'pp_comm')),
+            'paypal_withdrawal_commission': float(legacy_parse_decimal(get(17), 'pp_with_comm')),
+            'withdrawal_amount': float(legacy_parse_decimal(get(19), 'with_amt')),
+            'withdrawal_received': legacy_parse_boolean(get(20)),
+            'comment': get(21),
+            'sheet_row_number': row_num,
+            'row_hash': row_hash
+        })
+    return result
+
+
+def synthetic_rows(count: int, seed: int = 42):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(count):
+        row = [''] * ROW_WIDTH
+        row[0] = f"@client{rnd.randint(1, 500)}"
+        row[4] = str(rnd.randint(1, 31))
+        row[5] = rnd.choice(MONTHS)
+        row[6] = rnd.choice(['2024', '2025', '25', ''])
+        row[7] = rnd.choice([str(100000 + i), '', '9.11E+10', '12,5'])
+        row[8] = f"{rnd.uniform(10, 5000):.2f}" if rnd.random() < 0.8 else rnd.choice(AMOUNTS)
+        row[9] = rnd.choice(['PayPal', 'Stripe', 'Zelle Reco'])
+        row[10] = f" buyer{rnd.randint(1, 2000)}@mail.com "
+        for idx in (14, 15, 16, 17):
+            row[idx] = rnd.choice(['0', '0.035', '0,0476', '5', ''])
+        row[19] = f"{rnd.uniform(5, 4000):.2f}" if rnd.random() < 0.8 else rnd.choice(AMOUNTS)
+        row[20] = rnd.choice(BOOLS)
+        row[21] = rnd.choice(['', 'комментарий'])
+        rows.append(row)
+    return rows
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows = synthetic_rows(count)
+    numbers = list(range(2, count + 2))
+    hashes = [''] * count
+
+    start = time.perf_counter()
+    expected = legacy_parse(rows, numbers, hashes)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = parse_transaction_rows(rows, numbers, hashes)
+    columnar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parse_transaction_columns(rows)
+    columns_time = time.perf_counter() - start
+
+    assert actual == expected, "columnar parser output differs from row-wise parser"
+
+    print(f"rows:      {count}")
+    print(f"row-wise:  {legacy_time:.3f}s")
+    print(f"columnar:  {columnar_time:.3f}s (typed columns only: {columns_time:.3f}s)")
+    print(f"speedup:   {legacy_time / columnar_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+COPY-based bulk loader for the sheets sync.
+
+Streams records into a temporary staging table with the asyncpg COPY
+protocol (copy_records_to_table) and merges them into the target table
+with a single INSERT ... SELECT ... ON CONFLICT statement.
+
+Used for sheet_transactions batches and for the balance sheets
+(balances_paypal, balances_stripe, balances_paypal_withdrawal).
+"""
+from decimal import Decimal
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def _copy_value(value):
+    # asyncpg encodes NUMERIC from Decimal; the sync builds floats
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return value
+
+
+async def get_asyncpg_connection(session: AsyncSession):
+    """Raw asyncpg connection behind the session (None for other drivers)"""
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    driver_conn = getattr(raw, 'driver_connection', None)
+    if driver_conn is None or not hasattr(driver_conn, 'copy_records_to_table'):
+        return None
+    return driver_conn
+
+
+async def copy_upsert(
+    session: AsyncSession,
+    table: str,
+    columns: Sequence[str],
+    records: Iterable[Sequence],
+    conflict_columns: Sequence[str],
+    touch_column: Optional[str] = 'last_synced_at',
+    only_if_changed: Optional[str] = None,
+) -> int:
+    """
+    COPY records into a staging table and merge into `table`.
+
+    Must run inside a transaction (session.begin()): the staging table is
+    created ON COMMIT DROP. If the same conflict key appears several times
+    in `records`, the last occurrence wins (same as sequential upserts).
+
+    only_if_changed: column compared with IS DISTINCT FROM to skip no-op updates
+    (e.g. 'row_hash').
+
+    Returns number of inserted/updated rows.
+    """
+    driver_conn = await get_asyncpg_connection(session)
+    if driver_conn is None:
+        raise RuntimeError("copy_upsert requires the asyncpg driver")
+
+    stage = f"_stage_{table}"
+    cols = ', '.join(columns)
+    conflict = ', '.join(conflict_columns)
+
+    # Staging table with the same column types, no constraints/defaults
+    await session.execute(text(f"DROP TABLE IF EXISTS {stage}"))
+    await session.execute(text(f"""
+        CREATE TEMP TABLE {stage} ON COMMIT DROP AS
+        SELECT {cols}, 0::int AS _ord FROM {table} WITH NO DATA
+    """))
+
+    rows = [
+        tuple(_copy_value(v) for v in record) + (ordinal,)
+        for ordinal, record in enumerate(records)
+    ]
+    if not rows:
+        return 0
+
+    await driver_conn.copy_records_to_table(
+        stage,
+        records=rows,
+        columns=list(columns) + ['_ord']
+    )
+
+    update_columns = [c for c in columns if c not in conflict_columns]
+    set_parts = [f"{c} = EXCLUDED.{c}" for c in update_columns]
+    insert_cols = cols
+    select_cols = cols
+    if touch_column:
+        insert_cols += f", {touch_column}"
+        select_cols += ", CURRENT_TIMESTAMP"
+        set_parts.append(f"{touch_column} = EXCLUDED.{touch_column}")
+
+    where = ""
+    if only_if_changed:
+        where = f"WHERE {table}.{only_if_changed} IS DISTINCT FROM EXCLUDED.{only_if_changed}"
+
+    result = await session.execute(text(f"""
+        INSERT INTO {table} ({insert_cols})
+        SELECT {select_cols} FROM (
+            SELECT DISTINCT ON ({conflict}) *
+            FROM {stage}
+            ORDER BY {conflict}, _ord DESC
+        ) AS latest
+        ON CONFLICT ({conflict}) DO UPDATE SET
+            {', '.join(set_parts)}
+        {where}
+    """))
+    return result.rowcount
@@ -0,0 +1,68 @@
+"""
+"Client data changed" events from the sync service to the API.
+
+GoogleSheetsSync calls notify_clients_changed() inside the transaction that
+writes a client's rows (transactions + aggregates, balance sheets), so the
+Postgres NOTIFY is delivered on commit, after the new data is visible.
+The API listens on CLIENT_DATA_CHANNEL and drops the cached responses of
+exactly those clients.
+
+Payload: comma-separated client_key values (Telegram usernames contain no
+commas), split into several notifications under the 8000-byte NOTIFY limit.
+ALL_CLIENTS ('*') invalidates every client.
+
+The same call bumps client_data_versions (migration 016) for those keys.
+The API derives its ETags from these persisted versions, so they agree
+across workers and restarts.
+"""
+from typing import Iterable, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+CLIENT_DATA_CHANNEL = 'client_data_changed'
+ALL_CLIENTS = '*'
+
+# NOTIFY payload must be shorter than 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+
+# Sorted keys: concurrent syncs lock the rows in the same order
+BUMP_VERSIONS_QUERY = text("""
+    INSERT INTO client_data_versions (client_key, version, updated_at)
+    SELECT key, 1, CURRENT_TIMESTAMP FROM unnest(CAST(:keys AS text[])) AS key
+    ON CONFLICT (client_key) DO UPDATE SET
+        version = client_data_versions.version + 1,
+        updated_at = CURRENT_TIMESTAMP
+""")
+
+
+def encode_client_keys(client_keys: Iterable[str]) -> List[str]:
+    payloads, chunk, size = [], [], 0
+    for key in sorted(set(client_keys)):
+        length = len(key.encode()) + 1
+        if chunk and size + length > MAX_PAYLOAD_BYTES:
+            payloads.append(','.join(chunk))
+            chunk, size = [], 0
+        chunk.append(key)
+        size += length
+    if chunk:
+        payloads.append(','.join(chunk))
+    return payloads
+
+
+def decode_client_keys(payload: str) -> List[str]:
+    return [key for key in payload.split(',') if key]
+
+
+async def notify_clients_changed(session: AsyncSession, client_keys: Iterable[str]) -> int:
+    """Bump versions and queue notifications in the session's transaction, returns the number of keys"""
+    keys = sorted({key for key in client_keys if key})
+    if not keys:
+        return 0
+    await session.execute(BUMP_VERSIONS_QUERY, {'keys': keys})
+    for payload in encode_client_keys(keys):
+        await session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {'channel': CLIENT_DATA_CHANNEL, 'payload': payload}
+        )
+    return len(keys)
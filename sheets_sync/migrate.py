@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Apply SQL migrations from api/migrations.
+
+    python sheets_sync/migrate.py 012_sheets_outbox.sql [013_keyset_indexes.sql ...]
+
+A file may be given by name (looked up in api/migrations) or by path.
+Each file runs in its own transaction, statement by statement.
+"""
+import asyncio
+import os
+import re
+import sys
+from pathlib import Path
+from typing import List
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+load_dotenv(project_root / '.env')
+
+MIGRATIONS_DIR = project_root / 'api' / 'migrations'
+
+DOLLAR_TAG = re.compile(r'\$[A-Za-z_]*\$')
+
+
+def split_sql_statements(sql: str) -> List[str]:
+    """
+    Split a migration into statements on ';' outside of comments
+    (-- and /* */), quoted strings/identifiers and $$ bodies.
+    Comments are dropped from the returned statements.
+    """
+    statements, current = [], []
+    i, length = 0, len(sql)
+    while i < length:
+        char = sql[i]
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = length if end == -1 else end
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            current.append(' ')
+        elif char in ("'", '"'):
+            end = i + 1
+            while end < length:
+                if sql[end] == char:
+                    # '' / "" is an escaped quote
+                    if sql.startswith(char, end + 1):
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+        elif char == '$' and DOLLAR_TAG.match(sql, i):
+            tag = DOLLAR_TAG.match(sql, i).group()
+            end = sql.find(tag, i + len(tag))
+            end = length if end == -1 else end + len(tag)
+            current.append(sql[i:end])
+            i = end
+        elif char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def resolve_migration(name: str) -> Path:
+    path = Path(name)
+    if not path.exists():
+        path = MIGRATIONS_DIR / name
+    if not path.exists():
+        raise SystemExit(f"Error: migration {name} not found")
+    return path
+
+
+async def migrate(paths: List[Path]):
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("Error: DATABASE_URL not found")
+        return
+
+    engine = create_async_engine(database_url, echo=True)
+
+    try:
+        for path in paths:
+            print(f"Applying migration {path.name}...")
+            statements = split_sql_statements(path.read_text())
+            async with engine.begin() as conn:
+                for statement in statements:
+                    await conn.execute(text(statement))
+            print(f"Migration {path.name} completed successfully!")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(migrate([resolve_migration(name) for name in sys.argv[1:]]))
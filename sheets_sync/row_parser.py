@@ -0,0 +1,242 @@
+"""
+Row parsing for the payments sheet.
+
+Scalar parsers (parse_date, parse_decimal, parse_int, parse_boolean) are the
+reference implementation used by GoogleSheetsSync. parse_transaction_rows is
+the columnar pipeline: it transposes the get_values() matrix and parses each
+column in one pass, computing each distinct cell value once (dates, booleans,
+commissions repeat a lot) and taking a fast path for clean numeric strings.
+Output is identical to the scalar parsers.
+
+Benchmark: python sheets_sync/benchmark_row_parser.py
+"""
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Sequence
+
+MONTH_MAP = {
+    'январь': 1, 'января': 1,
+    'февраль': 2, 'февраля': 2,
+    'март': 3, 'марта': 3,
+    'апрель': 4, 'апреля': 4,
+    'май': 5, 'мая': 5,
+    'июнь': 6, 'июня': 6,
+    'июль': 7, 'июля': 7,
+    'август': 8, 'августа': 8,
+    'сентябрь': 9, 'сентября': 9,
+    'октябрь': 10, 'октября': 10,
+    'ноябрь': 11, 'ноября': 11,
+    'декабрь': 12, 'декабря': 12
+}
+
+TRUE_TOKENS = frozenset(['да', 'yes', 'true', '1', '+', 'received', 'done'])
+
+DECIMAL_LIMIT = Decimal('100000000')
+BIGINT_MAX = 9223372036854775807
+
+# Columns of the payments sheet (A..V)
+ROW_WIDTH = 22
+
+
+# --- Scalar parsers (reference) ---
+
+def parse_date(day: str, month: str, year: str) -> Optional[date]:
+    """Parse date from three fields (Day, MonthName, Year)"""
+    try:
+        d = int(day) if day else 1
+
+        # Month parsing
+        m = 1
+        if month:
+            clean_month = month.strip().lower()
+            if clean_month.isdigit():
+                m = int(clean_month)
+            else:
+                m = MONTH_MAP.get(clean_month, 1)
+
+        y = int(year) if year else datetime.now().year
+
+        if y < 100: y += 2000
+        if y < 1900 or y > 2100: y = datetime.now().year
+
+        return date(y, m, d)
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_decimal(value: str) -> Decimal:
+    """Parse decimal with cleaner handling for various locales"""
+    if not value:
+        return Decimal('0')
+
+    # Basic cleanup: remove currency symbols and spaces
+    cleaned = str(value).replace('$', '').replace(' ', '').strip()
+
+    # Handle comma vs dot
+    if ',' in cleaned:
+        if '.' in cleaned:
+            # Both present (e.g. 1,000.50): Assume comma is thousand separator
+            cleaned = cleaned.replace(',', '')
+        else:
+            # Only comma (e.g. 105,02): Assume comma is decimal separator
+            cleaned = cleaned.replace(',', '.')
+
+    try:
+        val = Decimal(cleaned)
+        # Cap huge values (e.g. scientific notation 9E+20) to 0
+        # Using 10^8 as reasonable limit for currency fields
+        if abs(val) >= DECIMAL_LIMIT:
+            return Decimal('0')
+        return val
+    except (InvalidOperation, ValueError):
+        return Decimal('0')
+
+
+def parse_boolean(value: str) -> bool:
+    if not value:
+        return False
+    return str(value).lower().strip() in TRUE_TOKENS
+
+
+def parse_int(value: str) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        # Handle float strings "123.0" or "9.11E+10"
+        val_f = float(str(value).replace(',', '.').strip())
+        # Cap at Postgres BigInt max to avoid overflow crashes
+        if abs(val_f) > BIGINT_MAX:
+            return None
+        return int(val_f)
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def normalize_client_key(username: Optional[str]) -> Optional[str]:
+    """
+    Canonical client key: '@Name ' / 'name' -> 'name'.
+    Stored in client_key columns at sync time; the API derives the same key
+    from initData, so client lookups are a plain equality on client_key.
+    SQL equivalent: LOWER(LTRIM(BTRIM(client_username), '@')).
+    """
+    if not username:
+        return None
+    return username.strip().lstrip('@').lower() or None
+
+
+def normalize_buyer_key(value: Optional[str]) -> Optional[str]:
+    """
+    Buyer identifier from the free-form "Реквизиты покупателя" cell:
+    ' John.Doe@Mail.com ' / 'john.doe @mail.com' -> 'john.doe@mail.com'.
+    SQL equivalent: LOWER(REGEXP_REPLACE(buyer_email, '\\s+', '', 'g')).
+    """
+    if not value:
+        return None
+    return ''.join(value.split()).lower() or None
+
+
+# --- Columnar pipeline ---
+# Column parsers take raw cells (strip happens once per distinct value)
+
+def _decimal_to_float(value: str) -> float:
+    v = value.strip()
+    if not v:
+        return 0.0
+    # Fast path: plain "123" / "-123.45" -> float() equals float(Decimal())
+    digits = v[1:] if v[0] == '-' else v
+    if digits.isascii() and digits.replace('.', '', 1).isdigit():
+        f = float(v)
+        if -1e8 < f < 1e8:
+            return f
+    return float(parse_decimal(v))
+
+
+def _int_or_none(value: str) -> Optional[int]:
+    v = value.strip()
+    # Exact below 2^53, so int(v) == int(float(v))
+    if v and len(v) < 16 and v.isascii() and v.isdigit():
+        return int(v)
+    return parse_int(v)
+
+
+def _boolean(value: str) -> bool:
+    return parse_boolean(value.strip())
+
+
+def _map_column(func, values: Sequence[str]) -> list:
+    """Apply func once per distinct cell value, then map the column"""
+    cache = {v: func(v) for v in set(values)}
+    return [cache[v] for v in values]
+
+
+def parse_decimal_column(values: Sequence[str]) -> List[float]:
+    return _map_column(_decimal_to_float, values)
+
+
+def parse_int_column(values: Sequence[str]) -> List[Optional[int]]:
+    return _map_column(_int_or_none, values)
+
+
+def parse_boolean_column(values: Sequence[str]) -> List[bool]:
+    return _map_column(_boolean, values)
+
+
+def parse_date_columns(days: Sequence[str], months: Sequence[str], years: Sequence[str]) -> List[Optional[date]]:
+    return _map_column(
+        lambda key: parse_date(key[0].strip(), key[1].strip(), key[2].strip()),
+        list(zip(days, months, years))
+    )
+
+
+def parse_transaction_columns(rows: Sequence[Sequence[str]]) -> Dict[str, list]:
+    """
+    Parse padded payments-sheet rows (>= 22 cells) into typed columns.
+    Same field mapping as GoogleSheetsSync.sync_transactions.
+    """
+    if not rows:
+        return {}
+
+    columns = list(zip(*rows))
+
+    def stripped(idx):
+        return [v.strip() for v in columns[idx]]
+
+    clients = stripped(0)
+    buyers = stripped(10)
+    return {
+        'client_username': clients,
+        'client_key': _map_column(normalize_client_key, clients),
+        'transaction_date': parse_date_columns(columns[4], columns[5], columns[6]),
+        'payment_id': parse_int_column(columns[7]),
+        'amount_gross': parse_decimal_column(columns[8]),
+        'payment_system': stripped(9),
+        'buyer_email': buyers,
+        'buyer_key': _map_column(normalize_buyer_key, buyers),
+        'intermediary_status': stripped(11),
+        'credential_type': stripped(12),
+        'client_credentials': stripped(13),
+        'ali_commission': parse_decimal_column(columns[14]),
+        'p2p_commission': parse_decimal_column(columns[15]),
+        'paypal_commission': parse_decimal_column(columns[16]),
+        'paypal_withdrawal_commission': parse_decimal_column(columns[17]),
+        'withdrawal_amount': parse_decimal_column(columns[19]),
+        'withdrawal_received': parse_boolean_column(columns[20]),
+        'comment': stripped(21),
+    }
+
+
+def parse_transaction_rows(
+    rows: Sequence[Sequence[str]],
+    row_numbers: Sequence[int],
+    row_hashes: Sequence[str]
+) -> List[dict]:
+    """Columnar parse -> list of upsert params (one dict per row)"""
+    columns = parse_transaction_columns(rows)
+    if not columns:
+        return []
+
+    columns['sheet_row_number'] = list(row_numbers)
+    columns['row_hash'] = list(row_hashes)
+
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
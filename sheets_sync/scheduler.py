@@ -0,0 +1,160 @@
+"""
+Sync scheduler for the Google Sheets sync services.
+
+Each sheet is a separate job with its own interval and jitter:
+- runs are measured from the start of the previous run, so a slow
+  transactions sync does not delay balance refreshes;
+- a Postgres advisory lock per job (pg_try_advisory_lock) guarantees that
+  two sync processes never run the same job at the same time;
+- before a run the spreadsheet's Drive modifiedTime is checked and the run
+  is skipped if it has not changed since the last successful run of the job
+  (a run is still forced every SYNC_FORCE_INTERVAL_MINUTES, because values
+  pulled in by formulas/IMPORTRANGE do not bump modifiedTime).
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from sheets_sync.sheets_executor import sheets_executor
+
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files/{}"
+
+# modifiedTime is shared by all jobs of the same spreadsheet
+MODIFIED_TIME_TTL = 15
+
+
+@dataclass
+class SyncJob:
+    name: str
+    run: Callable[[], Awaitable]
+    spreadsheet_id: Optional[str]
+    interval: float                 # seconds between run starts
+    jitter: float = 0.0             # random extra delay, seconds
+    force_interval: Optional[float] = None  # run even if unchanged after this many seconds
+
+    next_run: float = 0.0
+    last_run: Optional[float] = None
+    last_modified: Optional[str] = None
+    runs: int = 0
+    skipped: int = 0
+    locked: int = 0
+    errors: int = 0
+
+    def schedule_next(self, started: float):
+        self.next_run = started + self.interval + random.uniform(0, self.jitter)
+
+
+class SyncScheduler:
+    """Runs SyncJob's forever, each in its own loop"""
+
+    def __init__(self, engine: AsyncEngine, gspread_client, jobs: List[SyncJob]):
+        self.engine = engine
+        self.client = gspread_client
+        self.jobs = jobs
+        self._modified_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+
+    async def _spreadsheet_modified_time(self, spreadsheet_id: str) -> Optional[str]:
+        """Drive modifiedTime of the spreadsheet (None if it can't be fetched)"""
+        cached = self._modified_cache.get(spreadsheet_id)
+        now = time.monotonic()
+        if cached and now - cached[0] < MODIFIED_TIME_TTL:
+            return cached[1]
+
+        http = getattr(self.client, 'http_client', self.client)
+        try:
+            response = await sheets_executor.run(
+                http.request,
+                'get',
+                DRIVE_FILES_URL.format(spreadsheet_id),
+                params={'fields': 'modifiedTime', 'supportsAllDrives': True},
+                op='drive.modifiedTime'
+            )
+            modified = response.json().get('modifiedTime')
+        except Exception as e:
+            print(f"   ⚠️ modifiedTime check failed for {spreadsheet_id}: {e}")
+            modified = None
+
+        self._modified_cache[spreadsheet_id] = (now, modified)
+        return modified
+
+    def _should_skip(self, job: SyncJob, modified: Optional[str]) -> bool:
+        if modified is None or job.last_modified is None or modified != job.last_modified:
+            return False
+        if job.force_interval and job.last_run is not None:
+            return time.monotonic() - job.last_run < job.force_interval
+        return True
+
+    async def run_job(self, job: SyncJob):
+        """One scheduled run: modifiedTime check -> advisory lock -> job"""
+        modified = None
+        if job.spreadsheet_id:
+            modified = await self._spreadsheet_modified_time(job.spreadsheet_id)
+            if self._should_skip(job, modified):
+                job.skipped += 1
+                return
+
+        async with self.engine.connect() as conn:
+            # Autocommit: the lock is session-level, don't keep a transaction open
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            lock_key = f"sheets_sync:{job.name}"
+            acquired = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(hashtext(:key))"),
+                {"key": lock_key}
+            )).scalar()
+            if not acquired:
+                job.locked += 1
+                print(f"   🔒 {job.name}: running in another process, skipped")
+                return
+
+            try:
+                started = time.monotonic()
+                await job.run()
+                job.runs += 1
+                job.last_run = started
+                job.last_modified = modified
+                print(f"   ⏱️ {job.name}: {time.monotonic() - started:.2f}s "
+                      f"(sheets queue: {sheets_executor.queue_depth})")
+            finally:
+                await conn.execute(
+                    text("SELECT pg_advisory_unlock(hashtext(:key))"),
+                    {"key": lock_key}
+                )
+
+    async def _job_loop(self, job: SyncJob):
+        # Spread the first runs so jobs don't all hit the API at once
+        job.next_run = time.monotonic() + random.uniform(0, job.jitter)
+        while True:
+            delay = job.next_run - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            started = time.monotonic()
+            try:
+                await self.run_job(job)
+            except Exception as e:
+                job.errors += 1
+                print(f"❌ {job.name} failed: {e}")
+            job.schedule_next(started)
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            job.name: {
+                'runs': job.runs,
+                'skipped': job.skipped,
+                'locked': job.locked,
+                'errors': job.errors,
+            }
+            for job in self.jobs
+        }
+
+    async def run_forever(self):
+        print(f"🗓️ Scheduler started {datetime.now().strftime('%H:%M:%S')}")
+        for job in self.jobs:
+            print(f"   • {job.name}: every {job.interval:.0f}s (+{job.jitter:.0f}s jitter)")
+        await asyncio.gather(*(self._job_loop(job) for job in self.jobs))
@@ -0,0 +1,111 @@
+"""
+Bounded thread pool for blocking gspread calls.
+
+gspread is synchronous: every open_by_key / get_values / update is an HTTP
+round trip that blocks the event loop if called from a coroutine. All Sheets
+I/O in the sync service and in SheetsWriter goes through sheets_executor.run(),
+which runs the call in a small thread pool:
+
+- SHEETS_IO_WORKERS threads (default 4) – parallel calls to the Sheets API;
+- SHEETS_IO_MAX_PENDING (default 32) – calls queued or running at once,
+  further callers wait on a semaphore instead of growing the queue;
+- stats(): queue depth, in-flight calls and per-operation latency.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class SheetsExecutor:
+    def __init__(self, max_workers: int = 4, max_pending: int = 32):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sheets-io')
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # Metrics (updated from the event loop only)
+        self.pending = 0        # submitted to the pool, not finished
+        self.waiting = 0        # waiting for a free slot (max_pending reached)
+        self.ops: Dict[str, Dict[str, float]] = {}
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    def _record(self, op: str, wait: float, duration: float, failed: bool):
+        s = self.ops.get(op)
+        if s is None:
+            s = self.ops[op] = {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'wait_ms': 0.0}
+        ms = duration * 1000
+        s['calls'] += 1
+        s['errors'] += failed
+        s['total_ms'] += ms
+        s['wait_ms'] += wait * 1000
+        if ms > s['max_ms']:
+            s['max_ms'] = ms
+
+    async def run(self, func: Callable, *args, op: Optional[str] = None, **kwargs) -> Any:
+        """Run a blocking call in the pool: await sheets_executor.run(ws.get_values, 'A2:V')"""
+        op = op or getattr(func, '__name__', 'call')
+        slots = self._semaphore()
+
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        submitted = time.perf_counter()
+        started = []
+
+        def call():
+            started.append(time.perf_counter())
+            return func(*args, **kwargs)
+
+        self.pending += 1
+        failed = True
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, call)
+            failed = False
+            return result
+        finally:
+            self.pending -= 1
+            slots.release()
+            finished = time.perf_counter()
+            begin = started[0] if started else finished
+            self._record(op, begin - submitted, finished - begin, failed)
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls waiting for a worker thread (or for a slot)"""
+        return max(0, self.pending - self.max_workers) + self.waiting
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.max_workers,
+            'in_flight': min(self.pending, self.max_workers),
+            'queue_depth': self.queue_depth,
+            'ops': {
+                op: {
+                    'calls': int(s['calls']),
+                    'errors': int(s['errors']),
+                    'avg_ms': round(s['total_ms'] / s['calls'], 1) if s['calls'] else 0.0,
+                    'max_ms': round(s['max_ms'], 1),
+                    'avg_wait_ms': round(s['wait_ms'] / s['calls'], 1) if s['calls'] else 0.0,
+                }
+                for op, s in self.ops.items()
+            }
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+sheets_executor = SheetsExecutor(
+    max_workers=int(os.getenv('SHEETS_IO_WORKERS', '4')),
+    max_pending=int(os.getenv('SHEETS_IO_MAX_PENDING', '32'))
+)
@@ -3,7 +3,8 @@
 Optimized Google Sheets → PostgreSQL Sync Service
 
 Features:
-- "Tail Sync": Fetches only new rows + safety buffer (much faster)
+- "Tail Sync": Fetches only new rows + safety buffer (much faster),
+  with a periodic full reconciliation pass on a slower schedule
 - Parallel sync: Transactions and Balances run concurrently
 - Optimized parsing: Handles scientific notation and dirty data
 - Sync History: Tracks performance and errors
@@ -16,20 +17,84 @@ import hashlib
 import json
 from pathlib import Path
 from datetime import datetime, date
-from decimal import Decimal, InvalidOperation
-from typing import List, Dict, Optional, Any
+from decimal import Decimal
+from typing import List, Dict, Optional, Any, Set, Tuple
 
 import gspread
 from google.oauth2.service_account import Credentials
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import text
 
 # Load environment
 project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
 load_dotenv(project_root / '.env')
 
+from common.db_engine import create_db_engine, pool_options_from_env, pool_stats
+from sheets_sync.aggregates import refresh_buyer_summary, refresh_client_aggregates
+from sheets_sync.bulk_loader import copy_upsert
+from sheets_sync.client_events import notify_clients_changed
+from sheets_sync.scheduler import SyncJob, SyncScheduler
+from sheets_sync.sheets_executor import sheets_executor
+from sheets_sync.row_parser import (
+    ROW_WIDTH, normalize_client_key, parse_date, parse_decimal, parse_boolean, parse_int,
+    parse_transaction_rows
+)
+
+TRANSACTION_COLUMNS = (
+    'client_username', 'client_key', 'transaction_date', 'payment_id', 'amount_gross',
+    'payment_system', 'buyer_email', 'buyer_key', 'intermediary_status', 'credential_type',
+    'client_credentials', 'ali_commission', 'p2p_commission', 'paypal_commission',
+    'paypal_withdrawal_commission', 'withdrawal_amount', 'withdrawal_received',
+    'comment', 'sheet_row_number', 'row_hash'
+)
+TRANSACTION_CONFLICT = ('payment_id', 'client_username', 'sheet_row_number')
+# executemany path (SYNC_LOADER=executemany)
+TRANSACTION_UPSERT = text("""
+    INSERT INTO sheet_transactions (
+        client_username, client_key, transaction_date, payment_id, amount_gross,
+        payment_system, buyer_email, buyer_key, intermediary_status, credential_type,
+        client_credentials, ali_commission, p2p_commission, paypal_commission,
+        paypal_withdrawal_commission, withdrawal_amount, withdrawal_received,
+        comment, sheet_row_number, row_hash, last_synced_at
+    ) VALUES (
+        :client_username, :client_key, :transaction_date, :payment_id, :amount_gross,
+        :payment_system, :buyer_email, :buyer_key, :intermediary_status, :credential_type,
+        :client_credentials, :ali_commission, :p2p_commission, :paypal_commission,
+        :paypal_withdrawal_commission, :withdrawal_amount, :withdrawal_received,
+        :comment, :sheet_row_number, :row_hash, CURRENT_TIMESTAMP
+    )
+    ON CONFLICT (payment_id, client_username, sheet_row_number)
+    DO UPDATE SET
+        transaction_date = EXCLUDED.transaction_date,
+        amount_gross = EXCLUDED.amount_gross,
+        payment_system = EXCLUDED.payment_system,
+        buyer_email = EXCLUDED.buyer_email,
+        buyer_key = EXCLUDED.buyer_key,
+        intermediary_status = EXCLUDED.intermediary_status,
+        credential_type = EXCLUDED.credential_type,
+        client_credentials = EXCLUDED.client_credentials,
+        ali_commission = EXCLUDED.ali_commission,
+        p2p_commission = EXCLUDED.p2p_commission,
+        paypal_commission = EXCLUDED.paypal_commission,
+        paypal_withdrawal_commission = EXCLUDED.paypal_withdrawal_commission,
+        withdrawal_amount = EXCLUDED.withdrawal_amount,
+        withdrawal_received = EXCLUDED.withdrawal_received,
+        comment = EXCLUDED.comment,
+        row_hash = EXCLUDED.row_hash,
+        last_synced_at = CURRENT_TIMESTAMP
+    WHERE sheet_transactions.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+""")
+
+# Balance sheet kind -> (table, value column); stripe has its own layout
+BALANCE_SHEETS = {
+    'paypal': ('balances_paypal', 'balance'),
+    'stripe': ('balances_stripe', 'balance'),
+    'withdrawal': ('balances_paypal_withdrawal', 'withdrawal_amount'),
+}
+
 
 class GoogleSheetsSync:
     """Optimized Google Sheets sync service with Tail Sync"""
@@ -43,17 +108,24 @@ class GoogleSheetsSync:
         self.transactions_id = os.getenv('TRANSACTIONS_SPREADSHEET_ID')
         self.balances_id = os.getenv('BALANCES_SPREADSHEET_ID')
         self.sync_interval = int(os.getenv('SYNC_INTERVAL_MINUTES', '5'))
+        # Tail Sync: re-check this many rows before the last synced one
+        self.tail_window = int(os.getenv('TAIL_SYNC_WINDOW_ROWS', '200'))
+        # Full reconciliation (whole sheet) runs at most this often
+        self.full_sync_interval = int(os.getenv('FULL_SYNC_INTERVAL_MINUTES', '60'))
+        self._last_full_sync: Optional[float] = None
+        # 'copy' = COPY into staging table + one merge, 'executemany' = batched upserts
+        self.use_copy = os.getenv('SYNC_LOADER', 'copy').lower() == 'copy'
+        # Last synced values per balance worksheet: only changed clients are announced to the API
+        self._balance_snapshots: Dict[Any, Dict[str, tuple]] = {}
 
         db_url = os.getenv('DATABASE_URL')
         if not db_url:
             raise ValueError("DATABASE_URL not set in .env")
 
-        self.engine = create_async_engine(
-            db_url, 
-            echo=False,
-            pool_size=5,
-            max_overflow=10,
-            pool_pre_ping=True
+        self.engine = create_db_engine(
+            db_url,
+            name="sync",
+            **pool_options_from_env(pool_size=5, max_overflow=10)
         )
         self.async_session = sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
@@ -84,85 +156,17 @@ class GoogleSheetsSync:
 
     def parse_date(self, day: str, month: str, year: str) -> Optional[date]:
         """Parse date from three fields (Day, MonthName, Year)"""
-        MONTH_MAP = {
-            'январь': 1, 'января': 1,
-            'февраль': 2, 'февраля': 2,
-            'март': 3, 'марта': 3,
-            'апрель': 4, 'апреля': 4,
-            'май': 5, 'мая': 5,
-            'июнь': 6, 'июня': 6,
-            'июль': 7, 'июля': 7,
-            'август': 8, 'августа': 8,
-            'сентябрь': 9, 'сентября': 9,
-            'октябрь': 10, 'октября': 10,
-            'ноябрь': 11, 'ноября': 11,
-            'декабрь': 12, 'декабря': 12
-        }
-        try:
-            d = int(day) if day else 1
-            
-            # Month parsing
-            m = 1
-            if month:
-                clean_month = month.strip().lower()
-                if clean_month.isdigit():
-                    m = int(clean_month)
-                else:
-                    m = MONTH_MAP.get(clean_month, 1) # Default to Jan if unknown? Or maybe current month?
-            
-            y = int(year) if year else datetime.now().year
-            
-            if y < 100: y += 2000
-            if y < 1900 or y > 2100: y = datetime.now().year
-            
-            return date(y, m, d)
-        except (ValueError, TypeError):
-            return None
+        return parse_date(day, month, year)
 
     def parse_decimal(self, value: str, field_name: str = "") -> Decimal:
         """Parse decimal with cleaner handling for various locales"""
-        if not value:
-            return Decimal('0')
-            
-        # Basic cleanup: remove currency symbols and spaces
-        cleaned = str(value).replace('$', '').replace(' ', '').strip()
-        
-        # Handle comma vs dot
-        if ',' in cleaned:
-             if '.' in cleaned:
-                 # Both present (e.g. 1,000.50): Assume comma is thousand separator
-                 cleaned = cleaned.replace(',', '')
-             else:
-                 # Only comma (e.g. 105,02): Assume comma is decimal separator
-                 cleaned = cleaned.replace(',', '.')
-                 
-        try:
-            val = Decimal(cleaned)
-            # Cap huge values (e.g. scientific notation 9E+20) to 0 or valid max
-            # Using 10^8 as reasonable limit for currency fields
-            if abs(val) >= Decimal('100000000'):
-                return Decimal('0')
-            return val
-        except (InvalidOperation, ValueError):
-            return Decimal('0')
+        return parse_decimal(value)
 
     def parse_boolean(self, value: str) -> bool:
-        if not value:
-            return False
-        return str(value).lower().strip() in ['да', 'yes', 'true', '1', '+', 'received', 'done']
+        return parse_boolean(value)
 
     def parse_int(self, value: str) -> Optional[int]:
-        if not value:
-            return None
-        try:
-            # Handle float strings "123.0" or "9.11E+10"
-            val_f = float(str(value).replace(',', '.').strip())
-            # Cap at Postgres Integer/BigInt max to avoid overflow crashes
-            if abs(val_f) > 9223372036854775807: # BigInt max
-                return None
-            return int(val_f)
-        except (ValueError, TypeError):
-            return None
+        return parse_int(value)
     
     def _row_hash(self, row: list) -> str:
         return hashlib.md5(json.dumps(row, default=str).encode()).hexdigest()
@@ -176,6 +180,20 @@ class GoogleSheetsSync:
             max_row = result.scalar()
             return max_row if max_row else 1
 
+    async def _load_row_hashes(self, min_row: int = 2) -> Dict[int, str]:
+        """Load {sheet_row_number: row_hash} once per run (latest synced row wins)"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                text("""
+                    SELECT sheet_row_number, row_hash
+                    FROM sheet_transactions
+                    WHERE sheet_row_number >= :min_row
+                    ORDER BY last_synced_at
+                """),
+                {'min_row': min_row}
+            )
+            return {row[0]: row[1] for row in result}
+
     async def _record_sync_start(self, sync_type: str) -> int:
         try:
             async with self.async_session() as session:
@@ -193,7 +211,7 @@ class GoogleSheetsSync:
         except Exception:
             return None
 
-    async def _record_sync_complete(self, sync_id: int, processed: int, error: str = None):
+    async def _record_sync_complete(self, sync_id: int, processed: int, error: str = None, changed: int = 0):
         if not sync_id: return
         try:
             async with self.async_session() as session:
@@ -202,6 +220,7 @@ class GoogleSheetsSync:
                         UPDATE sync_history 
                         SET completed_at = CURRENT_TIMESTAMP,
                             rows_processed = :processed,
+                            rows_changed = :changed,
                             status = :status,
                             error_message = :error,
                             duration_seconds = EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - started_at))
@@ -210,6 +229,7 @@ class GoogleSheetsSync:
                     {
                         'id': sync_id,
                         'processed': processed,
+                        'changed': changed,
                         'status': 'failed' if error else 'completed',
                         'error': error
                     }
@@ -218,132 +238,168 @@ class GoogleSheetsSync:
         except Exception:
             pass
 
-    async def sync_transactions(self):
-        """Smart Tail-Sync for transactions"""
-        print(f"\n📊 Syncing transactions...")
-        sync_id = await self._record_sync_start('transactions')
+    def _full_sync_due(self) -> bool:
+        if self._last_full_sync is None:
+            return True
+        return time.monotonic() - self._last_full_sync >= self.full_sync_interval * 60
+
+    async def sync_transactions(self, full: Optional[bool] = None):
+        """
+        Smart Tail-Sync for transactions.
+
+        full=None: full reconciliation if FULL_SYNC_INTERVAL_MINUTES elapsed, tail otherwise.
+        Tail mode fetches only A{last_synced_row - TAIL_SYNC_WINDOW_ROWS}:V.
+        """
+        if full is None:
+            full = self._full_sync_due()
+
+        start_row = 2
+        if not full:
+            last_row = await self._get_last_synced_row()
+            if last_row <= 1:
+                full = True
+            else:
+                start_row = max(2, last_row - self.tail_window + 1)
+
+        sync_type = 'transactions' if full else 'transactions_tail'
+        print(f"\n📊 Syncing transactions ({'full' if full else 'tail'})...")
+        sync_id = await self._record_sync_start(sync_type)
         
         try:
-            spreadsheet = self.client.open_by_key(self.transactions_id)
-            worksheet = spreadsheet.get_worksheet(0)
+            spreadsheet = await sheets_executor.run(self.client.open_by_key, self.transactions_id)
+            worksheet = await sheets_executor.run(spreadsheet.get_worksheet, 0)
             
-            # Normal full sync for stability as requested
-            start_row = 2
-            print(f"   🚀 Starting full sync from row: {start_row}")
+            print(f"   🚀 Starting {'full' if full else 'tail'} sync from row: {start_row}")
 
-            # 2. Fetch all
-            rows = worksheet.get_all_values()[1:] # Skip headers
+            # Fetch only the needed range (columns A..V = 22 columns)
+            rows = await sheets_executor.run(worksheet.get_values, f"A{start_row}:V")
             
             if not rows:
                 print("   ⚠️  No data found")
+                if full:
+                    self._last_full_sync = time.monotonic()
                 await self._record_sync_complete(sync_id, 0)
                 return
 
             print(f"   📥 Fetched {len(rows)} transactions from Sheets")
 
-            batch_data = []
-            batch_size = 500
-            current_row_num = start_row
-            
-            synced_count = 0
+            # Hashes of what is already in DB: unchanged rows are skipped entirely
+            known_hashes = await self._load_row_hashes(start_row)
+            seen_rows = set()
 
-            for row in rows:
-                try:
-                    if len(row) < 22:
-                        row += [''] * (22 - len(row))
-
-                    def get(idx): return row[idx].strip()
-
-                    client = get(0)
-                    if not client or not client.startswith('@'):
-                        current_row_num += 1
-                        continue
-
-                    params = {
-                        'client_username': client,
-                        'transaction_date': self.parse_date(get(4), get(5), get(6)),
-                        'payment_id': self.parse_int(get(7)),
-                        'amount_gross': float(self.parse_decimal(get(8), 'amount')),
-                        'payment_system': get(9),
-                        'buyer_email': get(10),
-                        'intermediary_status': get(11),
-                        'credential_type': get(12),
-                        'client_credentials': get(13),
-                        'ali_commission': float(self.parse_decimal(get(14), 'ali_comm')),
-                        'p2p_commission': float(self.parse_decimal(get(15), 'p2p_comm')),
-                        'paypal_commission': float(self.parse_decimal(get(16), 'pp_comm')),
-                        'paypal_withdrawal_commission': float(self.parse_decimal(get(17), 'pp_with_comm')),
-                        'withdrawal_amount': float(self.parse_decimal(get(19), 'with_amt')),
-                        'withdrawal_received': self.parse_boolean(get(20)),
-                        'comment': get(21),
-                        'sheet_row_number': current_row_num,
-                        'row_hash': self._row_hash(row)
-                    }
-                    batch_data.append(params)
-                    current_row_num += 1
-
-                    if len(batch_data) >= batch_size:
-                        await self._process_transactions_batch(batch_data)
-                        synced_count += len(batch_data)
-                        batch_data = []
-                        print(f"   ⏳ Processed: {synced_count}...")
-
-                except Exception as e:
-                    print(f"\n   ⚠️  Error row {current_row_num}: {e}")
-                    current_row_num += 1
+            batch_size = 5000 if self.use_copy else 500
+            processed_count = 0
+
+            # 1. Cheap pass: keep only new/changed client rows
+            changed_rows, changed_numbers, changed_hashes = [], [], []
+            for row_num, row in enumerate(rows, start=start_row):
+                if len(row) < ROW_WIDTH:
+                    row += [''] * (ROW_WIDTH - len(row))
+
+                client = row[0].strip()
+                if not client or not client.startswith('@'):
                     continue
 
-            if batch_data:
-                await self._process_transactions_batch(batch_data)
-                synced_count += len(batch_data)
+                processed_count += 1
+                seen_rows.add(row_num)
+                row_hash = self._row_hash(row)
+                if known_hashes.get(row_num) == row_hash:
+                    continue
 
-            print(f"\n   ✅ Transactions synced: {synced_count} rows updated/inserted")
-            self.stats['transactions']['processed'] = synced_count
-            await self._record_sync_complete(sync_id, synced_count)
+                changed_rows.append(row)
+                changed_numbers.append(row_num)
+                changed_hashes.append(row_hash)
+
+            # 2. Columnar parse of changed rows only
+            parsed = parse_transaction_rows(changed_rows, changed_numbers, changed_hashes)
+            touched_clients, touched_buyers = set(), set()
+
+            synced_count = 0
+            for i in range(0, len(parsed), batch_size):
+                batch_data = parsed[i:i + batch_size]
+                clients, buyers = await self._process_transactions_batch(batch_data)
+                touched_clients |= clients
+                touched_buyers |= buyers
+                synced_count += len(batch_data)
+                print(f"   ⏳ Processed: {synced_count}...")
+
+            print(f"\n   ✅ Transactions synced: {synced_count} changed of {processed_count} rows")
+
+            # Rows that are in DB but no longer in the sheet (deleted / moved / client cleared)
+            missing_rows = sorted(set(known_hashes) - seen_rows)
+            if missing_rows:
+                preview = ', '.join(str(n) for n in missing_rows[:20])
+                more = f" (+{len(missing_rows) - 20} more)" if len(missing_rows) > 20 else ""
+                print(f"   ⚠️  {len(missing_rows)} rows disappeared from sheet: {preview}{more}")
+
+            if touched_clients:
+                print(f"   📈 Aggregates refreshed for {len(touched_clients)} clients")
+            if touched_buyers:
+                print(f"   🔎 Buyer summary refreshed for {len(touched_buyers)} buyers")
+            if full:
+                self._last_full_sync = time.monotonic()
+            self.stats['transactions']['processed'] = processed_count
+            self.stats['transactions']['new'] = synced_count
+            self.stats['transactions']['missing'] = len(missing_rows)
+            await self._record_sync_complete(sync_id, processed_count, changed=synced_count)
 
         except Exception as e:
             print(f"   ❌ Transaction sync error: {e}")
             await self._record_sync_complete(sync_id, 0, str(e))
+            raise
+
+    async def _process_transactions_batch(self, batch_data) -> Tuple[Set[str], Set[str]]:
+        """
+        Insert/Update batch and refresh client_aggregates / buyer_summary of its
+        clients and buyers in the same transaction. Committed row hashes always
+        come with up-to-date aggregates: if the batch or the refresh fails, both
+        roll back and the rows are retried on the next run.
+        Returns (client keys, buyer keys) of the batch.
+        """
+        clients = {p['client_key'] for p in batch_data if p['client_key']}
+        buyers = {p['buyer_key'] for p in batch_data if p['buyer_key']}
 
-    async def _process_transactions_batch(self, batch_data):
-        """Insert/Update batch"""
         async with self.async_session() as session:
             async with session.begin():
-                query = text("""
-                    INSERT INTO sheet_transactions (
-                        client_username, transaction_date, payment_id, amount_gross,
-                        payment_system, buyer_email, intermediary_status, credential_type,
-                        client_credentials, ali_commission, p2p_commission, paypal_commission,
-                        paypal_withdrawal_commission, withdrawal_amount, withdrawal_received,
-                        comment, sheet_row_number, last_synced_at
-                    ) VALUES (
-                        :client_username, :transaction_date, :payment_id, :amount_gross,
-                        :payment_system, :buyer_email, :intermediary_status, :credential_type,
-                        :client_credentials, :ali_commission, :p2p_commission, :paypal_commission,
-                        :paypal_withdrawal_commission, :withdrawal_amount, :withdrawal_received,
-                        :comment, :sheet_row_number, CURRENT_TIMESTAMP
+                if self.use_copy:
+                    records = [tuple(p[c] for c in TRANSACTION_COLUMNS) for p in batch_data]
+                    await copy_upsert(
+                        session, 'sheet_transactions', TRANSACTION_COLUMNS, records,
+                        TRANSACTION_CONFLICT, only_if_changed='row_hash'
                     )
-                    ON CONFLICT (payment_id, client_username, sheet_row_number)
-                    DO UPDATE SET
-                        transaction_date = EXCLUDED.transaction_date,
-                        amount_gross = EXCLUDED.amount_gross,
-                        payment_system = EXCLUDED.payment_system,
-                        buyer_email = EXCLUDED.buyer_email,
-                        intermediary_status = EXCLUDED.intermediary_status,
-                        credential_type = EXCLUDED.credential_type,
-                        client_credentials = EXCLUDED.client_credentials,
-                        ali_commission = EXCLUDED.ali_commission,
-                        p2p_commission = EXCLUDED.p2p_commission,
-                        paypal_commission = EXCLUDED.paypal_commission,
-                        paypal_withdrawal_commission = EXCLUDED.paypal_withdrawal_commission,
-                        withdrawal_amount = EXCLUDED.withdrawal_amount,
-                        withdrawal_received = EXCLUDED.withdrawal_received,
-                        comment = EXCLUDED.comment,
-                        last_synced_at = CURRENT_TIMESTAMP
-                """)
-                
-                clean_batch = [{k: v for k, v in p.items() if k != 'row_hash'} for p in batch_data]
-                await session.execute(query, clean_batch)
+                else:
+                    await session.execute(TRANSACTION_UPSERT, batch_data)
+                await refresh_client_aggregates(session, clients)
+                await refresh_buyer_summary(session, buyers)
+        return clients, buyers
+
+    async def _balance_worksheets(self) -> Dict[str, list]:
+        """Worksheets of the balances spreadsheet grouped by kind"""
+        spreadsheet = await sheets_executor.run(self.client.open_by_key, self.balances_id)
+        groups = {kind: [] for kind in BALANCE_SHEETS}
+        for ws in await sheets_executor.run(spreadsheet.worksheets):
+            title = ws.title.lower()
+            if 'paypal' in title and 'вывод' not in title:
+                groups['paypal'].append(ws)
+            elif 'stripe' in title:
+                groups['stripe'].append(ws)
+            elif 'вывод' in title or 'withdrawal' in title:
+                groups['withdrawal'].append(ws)
+        return groups
+
+    async def _sync_balance_worksheet(self, kind: str, ws):
+        if kind == 'stripe':
+            await self._sync_stripe_balance(ws)
+        else:
+            await self._sync_simple_sheet(ws, *BALANCE_SHEETS[kind])
+
+    async def sync_balance_sheet(self, kind: str):
+        """Sync one kind of balance sheet ('paypal', 'stripe', 'withdrawal')"""
+        if not self.balances_id: return
+        worksheets = (await self._balance_worksheets())[kind]
+        for ws in worksheets:
+            await self._sync_balance_worksheet(kind, ws)
+        print(f"   💰 Balances synced: {kind} ({len(worksheets)} sheets)")
 
     async def sync_balances(self):
         """Sync balances"""
@@ -351,18 +407,11 @@ class GoogleSheetsSync:
         print(f"\n💰 Syncing balances...")
         
         try:
-            spreadsheet = self.client.open_by_key(self.balances_id)
-            worksheets = spreadsheet.worksheets()
-            
-            tasks = []
-            for ws in worksheets:
-                title = ws.title.lower()
-                if 'paypal' in title and 'вывод' not in title:
-                    tasks.append(self._sync_simple_sheet(ws, 'balances_paypal', 'balance'))
-                elif 'stripe' in title:
-                    tasks.append(self._sync_stripe_balance(ws))
-                elif 'вывод' in title or 'withdrawal' in title:
-                    tasks.append(self._sync_simple_sheet(ws, 'balances_paypal_withdrawal', 'withdrawal_amount'))
+            tasks = [
+                self._sync_balance_worksheet(kind, ws)
+                for kind, worksheets in (await self._balance_worksheets()).items()
+                for ws in worksheets
+            ]
             
             if tasks:
                 await asyncio.gather(*tasks, return_exceptions=True)
@@ -371,9 +420,16 @@ class GoogleSheetsSync:
         except Exception as e:
             print(f"   ❌ Balance sync error: {e}")
 
+    def _balance_changes(self, worksheet, batch) -> tuple:
+        """(client_keys changed since the previous run of this worksheet, new snapshot)"""
+        previous = self._balance_snapshots.get(worksheet.id, {})
+        snapshot = {b['client']: tuple(b.values()) for b in batch}
+        changed = {b['key'] for b in batch if previous.get(b['client']) != snapshot[b['client']]}
+        return changed, snapshot
+
     async def _sync_simple_sheet(self, worksheet, table_name, col_val):
         """Generic sync for simple keys"""
-        rows = worksheet.get_all_values()
+        rows = await sheets_executor.run(worksheet.get_all_values)
         if len(rows) < 2: return
         
         batch = []
@@ -383,6 +439,7 @@ class GoogleSheetsSync:
             val = float(self.parse_decimal(row[1])) if len(row) > 1 else 0.0
             batch.append({
                 'client': row[0].strip(),
+                'key': normalize_client_key(row[0]),
                 'val': val,
                 'c1': row[2] if len(row) > 2 else '',
                 'c2': row[3] if len(row) > 3 else '',
@@ -390,26 +447,37 @@ class GoogleSheetsSync:
             })
             
         if not batch: return
+        changed, snapshot = self._balance_changes(worksheet, batch)
 
         async with self.async_session() as session:
             async with session.begin():
-                await session.execute(
-                    text(f"""
-                        INSERT INTO {table_name} (client_username, {col_val}, comment_1, comment_2, comment_3, last_synced_at)
-                        VALUES (:client, :val, :c1, :c2, :c3, CURRENT_TIMESTAMP)
-                        ON CONFLICT (client_username) DO UPDATE SET
-                            {col_val} = EXCLUDED.{col_val},
-                            comment_1 = EXCLUDED.comment_1,
-                            comment_2 = EXCLUDED.comment_2,
-                            comment_3 = EXCLUDED.comment_3,
-                            last_synced_at = CURRENT_TIMESTAMP
-                    """),
-                    batch
-                )
+                await notify_clients_changed(session, changed)
+                if self.use_copy:
+                    await copy_upsert(
+                        session, table_name,
+                        ('client_username', 'client_key', col_val, 'comment_1', 'comment_2', 'comment_3'),
+                        [(b['client'], b['key'], b['val'], b['c1'], b['c2'], b['c3']) for b in batch],
+                        ('client_username',)
+                    )
+                else:
+                    await session.execute(
+                        text(f"""
+                            INSERT INTO {table_name} (client_username, client_key, {col_val}, comment_1, comment_2, comment_3, last_synced_at)
+                            VALUES (:client, :key, :val, :c1, :c2, :c3, CURRENT_TIMESTAMP)
+                            ON CONFLICT (client_username) DO UPDATE SET
+                                {col_val} = EXCLUDED.{col_val},
+                                comment_1 = EXCLUDED.comment_1,
+                                comment_2 = EXCLUDED.comment_2,
+                                comment_3 = EXCLUDED.comment_3,
+                                last_synced_at = CURRENT_TIMESTAMP
+                        """),
+                        batch
+                    )
+        self._balance_snapshots[worksheet.id] = snapshot
 
     async def _sync_stripe_balance(self, worksheet):
         """Sync stripe balances"""
-        rows = worksheet.get_all_values()
+        rows = await sheets_executor.run(worksheet.get_all_values)
         if len(rows) < 2: return
 
         batch = []
@@ -423,6 +491,7 @@ class GoogleSheetsSync:
 
             batch.append({
                 'client': row[0].strip(),
+                'key': normalize_client_key(row[0]),
                 'bal': float(self.parse_decimal(row[1])),
                 'date': p_date,
                 'buyer': row[3] if len(row) > 3 else '',
@@ -430,22 +499,33 @@ class GoogleSheetsSync:
             })
             
         if not batch: return
+        changed, snapshot = self._balance_changes(worksheet, batch)
 
         async with self.async_session() as session:
             async with session.begin():
-                await session.execute(
-                    text("""
-                        INSERT INTO balances_stripe (client_username, balance, transaction_date, buyer_credentials, comment_1, last_synced_at)
-                        VALUES (:client, :bal, :date, :buyer, :c1, CURRENT_TIMESTAMP)
-                        ON CONFLICT (client_username) DO UPDATE SET
-                            balance = EXCLUDED.balance,
-                            transaction_date = EXCLUDED.transaction_date,
-                            buyer_credentials = EXCLUDED.buyer_credentials,
-                            comment_1 = EXCLUDED.comment_1,
-                            last_synced_at = CURRENT_TIMESTAMP
-                    """),
-                    batch
-                )
+                await notify_clients_changed(session, changed)
+                if self.use_copy:
+                    await copy_upsert(
+                        session, 'balances_stripe',
+                        ('client_username', 'client_key', 'balance', 'transaction_date', 'buyer_credentials', 'comment_1'),
+                        [(b['client'], b['key'], b['bal'], b['date'], b['buyer'], b['c1']) for b in batch],
+                        ('client_username',)
+                    )
+                else:
+                    await session.execute(
+                        text("""
+                            INSERT INTO balances_stripe (client_username, client_key, balance, transaction_date, buyer_credentials, comment_1, last_synced_at)
+                            VALUES (:client, :key, :bal, :date, :buyer, :c1, CURRENT_TIMESTAMP)
+                            ON CONFLICT (client_username) DO UPDATE SET
+                                balance = EXCLUDED.balance,
+                                transaction_date = EXCLUDED.transaction_date,
+                                buyer_credentials = EXCLUDED.buyer_credentials,
+                                comment_1 = EXCLUDED.comment_1,
+                                last_synced_at = CURRENT_TIMESTAMP
+                        """),
+                        batch
+                    )
+        self._balance_snapshots[worksheet.id] = snapshot
 
     async def run_sync(self):
         start = time.time()
@@ -459,22 +539,47 @@ class GoogleSheetsSync:
         
         elapsed = time.time() - start
         print(f"\n✨ DONE in {elapsed:.2f}s")
+        print(f"📡 Sheets I/O: {sheets_executor.stats()}")
+        print(f"🗄  DB pool: {pool_stats(self.engine)}")
         print(f"{'='*50}\n")
 
+    def scheduler_jobs(self) -> List[SyncJob]:
+        """Per-sheet jobs: the big payments sheet and each balance sheet separately"""
+        jitter = float(os.getenv('SYNC_JITTER_SECONDS', '10'))
+        force = float(os.getenv('SYNC_FORCE_INTERVAL_MINUTES', '30')) * 60
+        tx_interval = float(os.getenv('SYNC_TRANSACTIONS_INTERVAL_SECONDS', str(self.sync_interval * 60)))
+        bal_interval = float(os.getenv('SYNC_BALANCES_INTERVAL_SECONDS', '60'))
+
+        jobs = []
+        if self.transactions_id:
+            jobs.append(SyncJob('transactions', self.sync_transactions, self.transactions_id,
+                                tx_interval, jitter, force))
+        if self.balances_id:
+            for kind in BALANCE_SHEETS:
+                jobs.append(SyncJob(
+                    f'balances_{kind}',
+                    lambda kind=kind: self.sync_balance_sheet(kind),
+                    self.balances_id, bal_interval, jitter, force
+                ))
+        return jobs
+
+    async def run_once(self):
+        try:
+            await self.run_sync()
+        finally:
+            await self.engine.dispose()
+
     async def run_forever(self):
-        print(f"🔄 Service started. Interval: {self.sync_interval}m")
-        while True:
-            try:
-                await self.run_sync()
-            except Exception as e:
-                print(f"❌ CRITICAL ERROR: {e}")
-            
-            print(f"😴 Sleeping {self.sync_interval}m...")
-            await asyncio.sleep(self.sync_interval * 60)
+        print(f"🔄 Service started")
+        scheduler = SyncScheduler(self.engine, self.client, self.scheduler_jobs())
+        try:
+            await scheduler.run_forever()
+        finally:
+            await self.engine.dispose()
 
 if __name__ == '__main__':
     service = GoogleSheetsSync()
     if len(sys.argv) > 1 and sys.argv[1] == '--once':
-        asyncio.run(service.run_sync())
+        asyncio.run(service.run_once())
     else:
         asyncio.run(service.run_forever())
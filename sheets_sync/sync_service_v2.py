@@ -13,13 +13,21 @@ from typing import Optional
 import gspread
 from google.oauth2.service_account import Credentials
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import text
 
 project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
 load_dotenv(project_root / '.env')
 
+from common.db_engine import create_db_engine, pool_options_from_env
+from sheets_sync.aggregates import refresh_buyer_summary, refresh_client_aggregates
+from sheets_sync.client_events import ALL_CLIENTS, notify_clients_changed
+from sheets_sync.row_parser import normalize_buyer_key, normalize_client_key
+from sheets_sync.scheduler import SyncJob, SyncScheduler
+from sheets_sync.sheets_executor import sheets_executor
+
 
 class GoogleSheetsSync:
     """Класс для синхронизации данных из Google Sheets"""
@@ -38,7 +46,7 @@ class GoogleSheetsSync:
         if not db_url:
             raise ValueError("DATABASE_URL not set in .env")
 
-        self.engine = create_async_engine(db_url, echo=False)
+        self.engine = create_db_engine(db_url, name="sync", **pool_options_from_env(pool_size=5, max_overflow=10))
         self.async_session = sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
@@ -119,11 +127,11 @@ class GoogleSheetsSync:
         print(f"\n📊 Синхронизация транзакций...")
 
         try:
-            spreadsheet = self.client.open_by_key(self.spreadsheet_id)
-            worksheet = spreadsheet.worksheet('Платежи')
+            spreadsheet = await sheets_executor.run(self.client.open_by_key, self.spreadsheet_id)
+            worksheet = await sheets_executor.run(spreadsheet.worksheet, 'Платежи')
 
             # Получаем все данные
-            all_values = worksheet.get_all_values()
+            all_values = await sheets_executor.run(worksheet.get_all_values)
 
             if len(all_values) < 2:
                 print(f"⚠️  Таблица пустая или только заголовки")
@@ -136,6 +144,8 @@ class GoogleSheetsSync:
             async with self.async_session() as session:
                 synced_count = 0
                 skipped_count = 0
+                touched_clients = set()
+                touched_buyers = set()
 
                 for row_num, row in enumerate(data_rows, start=2):
                     try:
@@ -188,14 +198,14 @@ class GoogleSheetsSync:
                         # Вставка или обновление
                         query = text("""
                             INSERT INTO sheet_transactions (
-                                client_username, transaction_date, payment_id, amount_gross,
-                                payment_system, buyer_email, intermediary_status, credential_type,
+                                client_username, client_key, transaction_date, payment_id, amount_gross,
+                                payment_system, buyer_email, buyer_key, intermediary_status, credential_type,
                                 client_credentials, ali_commission, p2p_commission, paypal_commission,
                                 paypal_withdrawal_commission, withdrawal_amount, withdrawal_received,
                                 comment, sheet_row_number, last_synced_at
                             ) VALUES (
-                                :client_username, :transaction_date, :payment_id, :amount_gross,
-                                :payment_system, :buyer_email, :intermediary_status, :credential_type,
+                                :client_username, :client_key, :transaction_date, :payment_id, :amount_gross,
+                                :payment_system, :buyer_email, :buyer_key, :intermediary_status, :credential_type,
                                 :client_credentials, :ali_commission, :p2p_commission, :paypal_commission,
                                 :paypal_withdrawal_commission, :withdrawal_amount, :withdrawal_received,
                                 :comment, :sheet_row_number, CURRENT_TIMESTAMP
@@ -206,6 +216,7 @@ class GoogleSheetsSync:
                                 amount_gross = EXCLUDED.amount_gross,
                                 payment_system = EXCLUDED.payment_system,
                                 buyer_email = EXCLUDED.buyer_email,
+                                buyer_key = EXCLUDED.buyer_key,
                                 intermediary_status = EXCLUDED.intermediary_status,
                                 credential_type = EXCLUDED.credential_type,
                                 client_credentials = EXCLUDED.client_credentials,
@@ -219,13 +230,18 @@ class GoogleSheetsSync:
                                 last_synced_at = CURRENT_TIMESTAMP
                         """)
 
+                        client_key = normalize_client_key(client_username)
+                        buyer_key = normalize_buyer_key(buyer_email)
+
                         await session.execute(query, {
                             'client_username': client_username,
+                            'client_key': client_key,
                             'transaction_date': transaction_date,
                             'payment_id': payment_id,
                             'amount_gross': float(amount_gross),
                             'payment_system': payment_system,
                             'buyer_email': buyer_email,
+                            'buyer_key': buyer_key,
                             'intermediary_status': intermediary_status,
                             'credential_type': credential_type,
                             'client_credentials': client_credentials,
@@ -240,6 +256,8 @@ class GoogleSheetsSync:
                         })
 
                         synced_count += 1
+                        touched_clients.add(client_key)
+                        touched_buyers.add(buyer_key)
 
                         # Прогресс каждые 1000 строк
                         if synced_count % 1000 == 0:
@@ -250,8 +268,13 @@ class GoogleSheetsSync:
                         skipped_count += 1
                         continue
 
+                # Агрегаты и buyer_summary в той же транзакции, что и строки;
+                # refresh_client_aggregates шлёт NOTIFY по этим клиентам
+                clients_count = await refresh_client_aggregates(session, touched_clients)
+                buyers_count = await refresh_buyer_summary(session, touched_buyers)
                 await session.commit()
                 print(f"   ✅ Синхронизировано: {synced_count}, пропущено: {skipped_count}")
+                print(f"   📈 Агрегаты: {clients_count} клиентов, buyer_summary: {buyers_count} покупателей")
 
         except Exception as e:
             print(f"   ❌ Ошибка синхронизации транзакций: {e}")
@@ -262,10 +285,10 @@ class GoogleSheetsSync:
         print(f"\n💰 Синхронизация балансов...")
 
         try:
-            spreadsheet = self.client.open_by_key(self.spreadsheet_id)
-            worksheet = spreadsheet.worksheet('Баланс')
+            spreadsheet = await sheets_executor.run(self.client.open_by_key, self.spreadsheet_id)
+            worksheet = await sheets_executor.run(spreadsheet.worksheet, 'Баланс')
 
-            all_values = worksheet.get_all_values()
+            all_values = await sheets_executor.run(worksheet.get_all_values)
 
             if len(all_values) < 2:
                 print(f"⚠️  Лист балансов пустой")
@@ -291,8 +314,8 @@ class GoogleSheetsSync:
                         comment_3 = row[4] if len(row) > 4 else ''
 
                         query = text("""
-                            INSERT INTO balances_paypal (client_username, balance, comment_1, comment_2, comment_3, last_synced_at)
-                            VALUES (:client, :balance, :c1, :c2, :c3, CURRENT_TIMESTAMP)
+                            INSERT INTO balances_paypal (client_username, client_key, balance, comment_1, comment_2, comment_3, last_synced_at)
+                            VALUES (:client, :key, :balance, :c1, :c2, :c3, CURRENT_TIMESTAMP)
                             ON CONFLICT (client_username)
                             DO UPDATE SET
                                 balance = EXCLUDED.balance,
@@ -304,6 +327,7 @@ class GoogleSheetsSync:
 
                         await session.execute(query, {
                             'client': paypal_client,
+                            'key': normalize_client_key(paypal_client),
                             'balance': float(paypal_balance),
                             'c1': comment_1,
                             'c2': comment_2,
@@ -328,8 +352,8 @@ class GoogleSheetsSync:
                                 parsed_date = None
 
                         query = text("""
-                            INSERT INTO balances_stripe (client_username, balance, transaction_date, buyer_credentials, comment_1, last_synced_at)
-                            VALUES (:client, :balance, :date, :buyer, :c1, CURRENT_TIMESTAMP)
+                            INSERT INTO balances_stripe (client_username, client_key, balance, transaction_date, buyer_credentials, comment_1, last_synced_at)
+                            VALUES (:client, :key, :balance, :date, :buyer, :c1, CURRENT_TIMESTAMP)
                             ON CONFLICT (client_username)
                             DO UPDATE SET
                                 balance = EXCLUDED.balance,
@@ -341,6 +365,7 @@ class GoogleSheetsSync:
 
                         await session.execute(query, {
                             'client': stripe_client,
+                            'key': normalize_client_key(stripe_client),
                             'balance': float(stripe_balance),
                             'date': parsed_date,
                             'buyer': buyer_creds,
@@ -357,8 +382,8 @@ class GoogleSheetsSync:
                         comment_3 = row[18] if len(row) > 18 else ''
 
                         query = text("""
-                            INSERT INTO balances_paypal_withdrawal (client_username, withdrawal_amount, comment_1, comment_2, comment_3, last_synced_at)
-                            VALUES (:client, :withdrawal, :c1, :c2, :c3, CURRENT_TIMESTAMP)
+                            INSERT INTO balances_paypal_withdrawal (client_username, client_key, withdrawal_amount, comment_1, comment_2, comment_3, last_synced_at)
+                            VALUES (:client, :key, :withdrawal, :c1, :c2, :c3, CURRENT_TIMESTAMP)
                             ON CONFLICT (client_username)
                             DO UPDATE SET
                                 withdrawal_amount = EXCLUDED.withdrawal_amount,
@@ -370,6 +395,7 @@ class GoogleSheetsSync:
 
                         await session.execute(query, {
                             'client': withdrawal_client,
+                            'key': normalize_client_key(withdrawal_client),
                             'withdrawal': float(withdrawal),
                             'c1': comment_1,
                             'c2': comment_2,
@@ -377,11 +403,15 @@ class GoogleSheetsSync:
                         })
                         withdrawal_count += 1
 
+                await notify_clients_changed(session, [ALL_CLIENTS])
                 await session.commit()
                 print(f"   ✅ PayPal: {paypal_count}, Stripe: {stripe_count}, Выводы: {withdrawal_count}")
 
         except Exception as e:
             print(f"   ❌ Ошибка синхронизации балансов: {e}")
+            # Scheduler must see the failure: otherwise it records modifiedTime
+            # and skips retries until SYNC_FORCE_INTERVAL_MINUTES
+            raise
 
     async def run_sync(self):
         """Запуск синхронизации"""
@@ -404,37 +434,37 @@ class GoogleSheetsSync:
             raise
 
     async def run_forever(self):
-        """Запуск в бесконечном цикле"""
+        """Запуск планировщика: транзакции и балансы — отдельные задачи"""
         print(f"🚀 Запуск сервиса синхронизации...")
-        print(f"📊 Интервал: каждые {self.sync_interval} минут")
         print(f"📋 Spreadsheet ID: {self.spreadsheet_id}")
         print(f"\nPress Ctrl+C to stop\n")
 
-        while True:
-            try:
-                await self.run_sync()
-                print(f"⏳ Следующая синхронизация через {self.sync_interval} минут...")
-                await asyncio.sleep(self.sync_interval * 60)
-
-            except KeyboardInterrupt:
-                print(f"\n⏹️  Остановка сервиса...")
-                break
-            except Exception as e:
-                print(f"❌ Ошибка: {e}")
-                print(f"⏳ Повторная попытка через {self.sync_interval} минут...")
-                await asyncio.sleep(self.sync_interval * 60)
+        jitter = float(os.getenv('SYNC_JITTER_SECONDS', '10'))
+        force = float(os.getenv('SYNC_FORCE_INTERVAL_MINUTES', '30')) * 60
+        jobs = [
+            SyncJob('transactions', self.sync_transactions, self.spreadsheet_id,
+                    float(os.getenv('SYNC_TRANSACTIONS_INTERVAL_SECONDS', str(self.sync_interval * 60))),
+                    jitter, force),
+            SyncJob('balances', self.sync_balances, self.spreadsheet_id,
+                    float(os.getenv('SYNC_BALANCES_INTERVAL_SECONDS', '60')),
+                    jitter, force),
+        ]
+        await SyncScheduler(self.engine, self.client, jobs).run_forever()
 
 
 async def main():
     """Главная функция"""
     sync_service = GoogleSheetsSync()
 
-    if len(sys.argv) > 1 and sys.argv[1] == '--once':
-        # Разовая синхронизация
-        await sync_service.run_sync()
-    else:
-        # Непрерывная синхронизация
-        await sync_service.run_forever()
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == '--once':
+            # Разовая синхронизация
+            await sync_service.run_sync()
+        else:
+            # Непрерывная синхронизация
+            await sync_service.run_forever()
+    finally:
+        await sync_service.engine.dispose()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,114 @@
+"""
+ETag / 304 for client data endpoints: the ETag comes from client_data_versions,
+so separate workers (separate ClientResponseCache) and restarts agree on it.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Response
+
+import api.main as api_main
+from api.main import ClientResponseCache, conditional_client_response
+
+
+class FakeResult:
+    def __init__(self, row):
+        self._row = row
+
+    def one(self):
+        return self._row
+
+
+class FakeDB:
+    """client_data_versions: {client_key: version}"""
+
+    def __init__(self, versions):
+        self.versions = versions
+        self.queries = 0
+
+    async def execute(self, query, params):
+        self.queries += 1
+        return FakeResult((self.versions.get(params["client_key"], 0), self.versions.get("*", 0)))
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """Switch api.main to a fresh response cache, like another worker process"""
+    def use_new_cache(tracking=True):
+        cache = ClientResponseCache(100, 60)
+        cache.tracking = tracking
+        monkeypatch.setattr(api_main, "client_response_cache", cache)
+        return cache
+    return use_new_cache
+
+
+def request(db, if_none_match=None, loads=None):
+    ctx = SimpleNamespace(client_key="alice")
+    response = Response()
+
+    async def load():
+        if loads is not None:
+            loads.append(1)
+        return {"total": db.versions.get("alice", 0)}
+
+    result = asyncio.run(conditional_client_response(ctx, ("balance",), load, if_none_match, response, db))
+    if isinstance(result, Response):
+        return result.status_code, result.headers["ETag"], None
+    return 200, response.headers["ETag"], result
+
+
+def test_etag_same_across_workers(worker):
+    db = FakeDB({"alice": 3})
+
+    worker()
+    status, etag, body = request(db)
+    assert status == 200 and body == {"total": 3}
+
+    # Another worker / after a restart: same ETag, 304 without loading the body
+    worker()
+    loads = []
+    status, etag_b, _ = request(db, if_none_match=etag, loads=loads)
+    assert status == 304 and etag_b == etag and not loads
+
+
+def test_etag_changes_with_data_version(worker):
+    db = FakeDB({"alice": 3})
+    worker()
+    _, etag, _ = request(db)
+
+    # Sync commits: version bumped, the listener drops the client's entries
+    db.versions["alice"] = 4
+    api_main.client_response_cache.invalidate(["alice"])
+    status, new_etag, body = request(db, if_none_match=etag)
+    assert status == 200 and new_etag != etag and body == {"total": 4}
+
+    # Sync of all clients ('*') changes every client's ETag
+    db.versions["*"] = 1
+    api_main.client_response_cache.invalidate_all()
+    status, all_etag, _ = request(db, if_none_match=new_etag)
+    assert status == 200 and all_etag not in (etag, new_etag)
+
+
+def test_cache_hit_with_listener_skips_db(worker):
+    db = FakeDB({"alice": 1})
+    worker(tracking=True)
+    _, etag, _ = request(db)
+    queries = db.queries
+
+    status, _, _ = request(db, if_none_match=etag)
+    assert status == 304 and db.queries == queries
+
+
+def test_without_listener_cache_is_checked_against_db(worker):
+    db = FakeDB({"alice": 1})
+    worker(tracking=False)
+    loads = []
+    request(db, loads=loads)
+    request(db, loads=loads)
+    assert len(loads) == 1
+
+    # No NOTIFY received: the changed version in the DB still drops the entry
+    db.versions["alice"] = 2
+    _, _, body = request(db, loads=loads)
+    assert len(loads) == 2 and body == {"total": 2}
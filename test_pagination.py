@@ -0,0 +1,55 @@
+from datetime import date, datetime
+
+import pytest
+
+from bot.database.pagination import (
+    MAX_PAGE_SIZE, InvalidCursor, InvalidPageSize, decode_cursor, encode_cursor, parse_page_size, split_page
+)
+
+
+def test_cursor_roundtrip():
+    assert decode_cursor(encode_cursor(date(2025, 8, 30), 421)) == (date(2025, 8, 30), 421)
+    assert decode_cursor(encode_cursor(datetime(2025, 8, 30, 12, 5, 1), 7)) == (datetime(2025, 8, 30, 12, 5, 1), 7)
+    assert decode_cursor(encode_cursor(None, 3)) == (None, 3)
+    # Opaque and URL-safe: no padding, no '+' or '/'
+    assert not set(encode_cursor(datetime(2025, 1, 1, 23, 59, 59), 10 ** 12)) & set("=+/")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not-base64!!",
+    "e30",                        # {}
+    "WzFd",                       # [1]
+    "WyIyMDI1LTA4LTMwIiwiYSJd",   # ["2025-08-30","a"]: id is not an int
+    "WyJ5ZXN0ZXJkYXkiLDFd",       # ["yesterday",1]: not a date
+    "WzEsMSwxXQ",                 # [1,1,1]
+])
+def test_malformed_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_split_page():
+    rows = [(date(2025, 1, 10 - i), 100 - i) for i in range(5)]
+    key = lambda row: (row[0], row[1])
+
+    page, next_cursor = split_page(rows, 5, key)
+    assert page == rows and next_cursor is None
+
+    page, next_cursor = split_page(rows, 4, key)
+    assert page == rows[:4]
+    assert decode_cursor(next_cursor) == (date(2025, 1, 7), 97)
+
+    assert split_page([], 1, key) == ([], None)
+    with pytest.raises(InvalidPageSize):
+        split_page(rows, 0, key)
+
+
+def test_parse_page_size():
+    assert parse_page_size(None) == 50
+    assert parse_page_size("") == 50
+    assert parse_page_size("1") == 1
+    assert parse_page_size(str(MAX_PAGE_SIZE)) == MAX_PAGE_SIZE
+    for raw in ("0", "-1", str(MAX_PAGE_SIZE + 1), "ten", "1.5"):
+        with pytest.raises(InvalidPageSize):
+            parse_page_size(raw)
@@ -2,7 +2,8 @@ import hmac
 import hashlib
 import json
 import urllib.parse
-from api.main import validate_telegram_data
+import time
+from api.main import validate_telegram_data, InitDataCache
 
 def test_telegram_validation():
     # 1. Setup mock data
@@ -48,9 +49,27 @@ def test_telegram_validation():
     assert validate_telegram_data(tampered_data, bot_token) == False
     print("✅ Tampered Data passed")
 
+def test_init_data_cache():
+    cache = InitDataCache(max_size=2, ttl=300)
+
+    print("Testing LRU eviction...")
+    cache.put("a", {"id": 1})
+    cache.put("b", {"id": 2})
+    assert cache.get("a") == {"id": 1}
+    cache.put("c", {"id": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"id": 1}
+    print("✅ LRU eviction passed")
+
+    print("Testing auth_date expiry cap...")
+    cache.put("expired", {"id": 4}, expires_at=time.time() - 1)
+    assert cache.get("expired") is None
+    print("✅ Expiry cap passed")
+
 if __name__ == "__main__":
     try:
         test_telegram_validation()
+        test_init_data_cache()
         print("\nAll security tests passed! 🔒")
     except AssertionError as e:
         print(f"\n❌ Test failed: {e}")
@@ -0,0 +1,100 @@
+"""
+UserRepository + user_cache: invalidation after updates and stale entries
+after writes from another process (the API). Uses in-memory SQLite (aiosqlite).
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from bot.database.models import Base, User
+from bot.database.repositories.user import UserRepository
+from bot.database.user_cache import user_cache
+
+
+class TgUser:
+    def __init__(self, user_id, username="alice", first_name="Alice", last_name=None):
+        self.id = user_id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.language_code = "en"
+        self.is_premium = False
+
+
+async def _session_maker():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def _stop_activity_flush():
+    # touch() starts the periodic last_active_at flush against the real DB
+    if user_cache._task:
+        user_cache._task.cancel()
+        await asyncio.gather(user_cache._task, return_exceptions=True)
+        user_cache._task = None
+    user_cache._activity.clear()
+
+
+def test_update_invalidates_cache():
+    async def run():
+        engine, maker = await _session_maker()
+        tg_user = TgUser(1001)
+        try:
+            async with maker() as session:
+                await UserRepository(session).get_or_create(tg_user)
+                await session.commit()
+            assert user_cache.get(tg_user.id) is not None
+
+            async with maker() as session:
+                assert await UserRepository(session).set_referral_code(tg_user.id, "CODE1")
+                await session.commit()
+            assert user_cache.get(tg_user.id) is None
+
+            # Next request misses the cache and sees the new code
+            async with maker() as session:
+                db_user, is_new = await UserRepository(session).get_or_create(tg_user)
+                assert not is_new
+                assert db_user.referral_code == "CODE1"
+        finally:
+            user_cache.invalidate(tg_user.id)
+            await _stop_activity_flush()
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_get_by_id_reloads_stale_cached_user():
+    async def run():
+        engine, maker = await _session_maker()
+        tg_user = TgUser(1002)
+        try:
+            async with maker() as session:
+                await UserRepository(session).get_or_create(tg_user)
+                await session.commit()
+
+            # Another process (the API) sets the code: this process' cache is not invalidated
+            async with maker() as session:
+                await session.execute(update(User).where(User.id == tg_user.id).values(referral_code="API"))
+                await session.commit()
+
+            async with maker() as session:
+                repo = UserRepository(session)
+                db_user, _ = await repo.get_or_create(tg_user)
+                assert db_user.referral_code is None  # cached snapshot
+
+                fresh = await repo.get_by_id(tg_user.id)
+                assert fresh is db_user
+                assert db_user.referral_code == "API"
+        finally:
+            user_cache.invalidate(tg_user.id)
+            await _stop_activity_flush()
+            await engine.dispose()
+
+    asyncio.run(run())
@@ -129,27 +129,22 @@ export const DataProvider = ({ children }) => {
     }
 
     try {
-      // Parallel Fetching - headers object is passed by reference to all
-      const [balanceRes, statsRes, txsRes] = await Promise.all([
-        fetch(`${API_URL}/balance`, { headers }),
-        fetch(`${API_URL}/statistics`, { headers }),
-        fetch(`${API_URL}/transactions?limit=50`, { headers }),
-      ])
+      // Single roundtrip: balance, stats, first transactions page and access status
+      const dashboardRes = await fetch(`${API_URL}/dashboard?limit=50`, { headers })
+      if (!dashboardRes.ok) throw new Error(`Dashboard failed: ${dashboardRes.status}`)
+      const dashboardData = await dashboardRes.json()
+
+      if (!dashboardData.balance) throw new Error('Access denied')
 
       // 1. Process Balance
-      if (!balanceRes.ok) throw new Error(`Balance failed: ${balanceRes.status}`)
-      const balanceData = await balanceRes.json()
-      addLog(`Balance Loaded: $${balanceData.total}`)
-      setBalance(balanceData)
+      addLog(`Balance Loaded: $${dashboardData.balance.total}`)
+      setBalance(dashboardData.balance)
 
       // 2. Process Stats
-      if (!statsRes.ok) throw new Error(`Stats failed: ${statsRes.status}`)
-      const statsData = await statsRes.json()
-      setStats(statsData)
+      setStats(dashboardData.statistics)
 
       // 3. Process Transactions
-      if (!txsRes.ok) throw new Error(`Transactions failed: ${txsRes.status}`)
-      const txsData = await txsRes.json()
+      const txsData = dashboardData.transactions
       addLog(`Transactions: ${txsData.transactions?.length || 0}`)
       setTransactions(txsData.transactions || [])
 